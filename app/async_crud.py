@@ -0,0 +1,211 @@
+from datetime import datetime
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from . import models
+from .crud import (
+    CALCULATION_BY_ID,
+    CALCULATION_COLUMNS,
+    CALCULATION_ROW_BY_ID,
+    USER_LOGIN_BY_USERNAME,
+    USER_READ_BY_ID,
+    USER_READ_COLUMNS,
+    DuplicateUser,
+    calculation_values,
+    duplicate_user_field,
+    prepare_calculations,
+)
+from .retention import DELETE_CHUNK_SIZE, calculation_filters, delete_chunk_stmt, next_chunk_stmt
+from .schemas import CalculationCreate, UserCreate
+from .tracing import traced
+
+# ------------------------------------------------------------------------
+# Async counterparts of app.crud for AsyncSession (see app.async_main).
+# Pure helpers (validation, cursors, batch preparation) are shared.
+# ------------------------------------------------------------------------
+
+# ------------------------------------------------------------------------
+# Single-statement writes (see app.crud)
+# ------------------------------------------------------------------------
+async def _insert_returning(db: AsyncSession, model, values: dict, columns: tuple):
+    stmt = insert(model).values(**values)
+    if db.bind.dialect.insert_returning:
+        return (await db.execute(stmt.returning(*columns))).one()
+    pk = (await db.execute(stmt)).inserted_primary_key[0]
+    return (await db.execute(select(*columns).where(model.id == pk))).one()
+
+
+async def _update_returning(db: AsyncSession, model, pk: int, values: dict, columns: tuple):
+    stmt = (
+        update(model)
+        .where(model.id == pk)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        return (await db.execute(stmt.returning(*columns))).first()
+    if (await db.execute(stmt)).rowcount == 0:
+        return None
+    return (await db.execute(select(*columns).where(model.id == pk))).one()
+
+
+# ------------------------------------------------------------------------
+# Calculation CRUD
+# ------------------------------------------------------------------------
+@traced
+async def create_calculation(db: AsyncSession, payload: CalculationCreate, persist_result: bool = True):
+    values = calculation_values(payload)
+    if not persist_result:
+        return models.Calculation(**values)
+
+    row = await _insert_returning(db, models.Calculation, values, CALCULATION_COLUMNS)
+    await db.commit()
+    return row
+
+
+@traced
+async def create_calculations(db: AsyncSession, items: list):
+    rows, errors = prepare_calculations(items)
+    if not rows:
+        return [], errors
+
+    if db.bind.dialect.name == "sqlite":
+        # See app.crud._insert_many_sqlite
+        await db.execute(insert(models.Calculation), rows)
+        last = await db.scalar(select(func.max(models.Calculation.id)))
+        ids = list(range(last - len(rows) + 1, last + 1))
+    elif db.bind.dialect.insert_executemany_returning:
+        stmt = insert(models.Calculation).returning(
+            models.Calculation.id, sort_by_parameter_order=True
+        )
+        ids = (await db.scalars(stmt, rows)).all()
+    else:
+        objs = [models.Calculation(**row) for row in rows]
+        db.add_all(objs)
+        await db.flush()
+        ids = [obj.id for obj in objs]
+
+    await db.commit()
+    created = [{"id": calc_id, **row} for calc_id, row in zip(ids, rows)]
+    return created, errors
+
+
+@traced
+async def get_calculation_row(db: AsyncSession, calc_id: int):
+    return (await db.execute(CALCULATION_ROW_BY_ID, {"calc_id": calc_id})).first()
+
+
+@traced
+async def get_calculation(db: AsyncSession, calc_id: int):
+    return (await db.scalars(CALCULATION_BY_ID, {"calc_id": calc_id})).first()
+
+
+@traced
+async def update_calculation(db: AsyncSession, calc_id: int, payload: CalculationCreate):
+    row = await _update_returning(db, models.Calculation, calc_id, calculation_values(payload), CALCULATION_COLUMNS)
+    await db.commit()
+    return row
+
+
+@traced
+async def delete_calculation(db: AsyncSession, calc_id: int) -> bool:
+    result = await db.execute(
+        delete(models.Calculation)
+        .where(models.Calculation.id == calc_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+@traced
+async def delete_calculations(db: AsyncSession, chunk_size: int = DELETE_CHUNK_SIZE, on_chunk=None, **filters) -> int:
+    """Chunked bulk delete; see app.retention.delete_calculations."""
+    conditions = calculation_filters(**filters)
+    if not conditions:
+        raise ValueError("Refusing to delete without a filter")
+
+    deleted, last_id = 0, None
+    while True:
+        ids = (await db.scalars(next_chunk_stmt(conditions, chunk_size, last_id))).all()
+        if not ids:
+            break
+        await db.execute(delete_chunk_stmt(ids))
+        await db.commit()
+        deleted += len(ids)
+        last_id = ids[-1]
+        if on_chunk is not None:
+            on_chunk(ids)
+        if len(ids) < chunk_size:
+            break
+    return deleted
+
+
+@traced
+async def list_calculations(db: AsyncSession, limit: int, after_id: Optional[int] = None):
+    stmt = select(*CALCULATION_COLUMNS).order_by(models.Calculation.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(models.Calculation.id > after_id)
+
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+async def stream_calculations(db: AsyncSession, after_id: Optional[int] = None, chunk_size: int = 1000):
+    """Yield lists of CALCULATION_COLUMNS Rows, ``chunk_size`` at a time, in id order."""
+    stmt = (
+        select(*CALCULATION_COLUMNS)
+        .order_by(models.Calculation.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if after_id is not None:
+        stmt = stmt.where(models.Calculation.id > after_id)
+
+    result = await db.stream(stmt)
+    async for chunk in result.partitions():
+        yield chunk
+
+
+# ------------------------------------------------------------------------
+# User CRUD + Auth
+# ------------------------------------------------------------------------
+@traced
+async def get_user_by_username(db: AsyncSession, username: str):
+    return (await db.execute(USER_LOGIN_BY_USERNAME, {"username": username})).first()
+
+
+@traced
+async def get_user(db: AsyncSession, user_id: int):
+    return (await db.execute(USER_READ_BY_ID, {"user_id": user_id})).first()
+
+
+@traced
+async def create_user(db: AsyncSession, user_create: UserCreate, hashed_password: str):
+    try:
+        user = await _insert_returning(db, models.User, {
+            "username": user_create.username,
+            "email": user_create.email,
+            "hashed_password": hashed_password,
+        }, USER_READ_COLUMNS)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        field = duplicate_user_field(e)
+        if field is None:
+            raise
+        raise DuplicateUser(field) from None
+
+    return user
+
+
+@traced
+async def revoke_token(db: AsyncSession, claims: dict):
+    await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= datetime.utcnow()))
+    await db.execute(insert(models.RevokedToken).values(
+        jti=claims["jti"], expires_at=datetime.utcfromtimestamp(claims["exp"])
+    ))
+    await db.commit()
@@ -0,0 +1,305 @@
+from fastapi import FastAPI, Body, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime
+from typing import Any, Optional
+
+from . import async_crud as crud
+from . import metrics, querylog, timing, tracing
+from .auth import get_current_user_async, get_token_claims, revocations, signer
+from .crud import encode_cursor, decode_cursor
+from .cache import calculation_cache, result_cache
+from .database import DATABASE_URL, async_engine, engine, get_async_db, get_db
+from .exporter import close_after, content_type, export_calculations
+from .hashing import HashingOverloaded, hash_pool, hash_password, verify_password
+from .metrics import pool_stats
+from .migrations import upgrade
+from .services import (
+    BATCH_MAX_ITEMS,
+    STREAM_CHUNK_SIZE,
+    forget_cached,
+    retention_job,
+    revocation_sync,
+    sqlite_maintenance,
+)
+from .models import Base
+from .serialization import (
+    FastResponse,
+    batch_response,
+    calculation_dict,
+    calculation_page_response,
+    calculation_response,
+    dumps,
+)
+from .schemas import (
+    CalculationCreate,
+    CalculationRead,
+    CalculationPage,
+    CalculationBatchResult,
+    OpType,
+    UserCreate,
+    UserRead,
+    UserLogin,
+    TokenResponse,
+)
+
+# Async twin of app.main, served when DATABASE_URL names an async driver
+# (postgresql+asyncpg://, sqlite+aiosqlite://). Every handler awaits the
+# AsyncEngine instead of borrowing a threadpool thread, so one worker can
+# hold thousands of in-flight requests.
+app = FastAPI(title="Calculation Service (for assignment, async)", default_response_class=FastResponse)
+timing.install(app)
+metrics.install(app)
+tracing.install(app)
+querylog.install(app)
+metrics.registry.set_collector("runtime", metrics.runtime_collector(
+    {"sync": engine.pool, **({"async": async_engine.pool} if async_engine is not None else {})},
+    hash_pool,
+    {"result": result_cache, "calculation": calculation_cache},
+))
+
+
+# --- Startup ---
+@app.on_event("startup")
+async def startup():
+    # SQLite auto-create for local dev
+    if DATABASE_URL.startswith("sqlite"):
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    # Columns and tables added since the database was created (app.migrations)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(upgrade)
+    retention_job.start()
+    revocation_sync.start()
+    sqlite_maintenance.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    retention_job.stop()
+    revocation_sync.stop()
+    sqlite_maintenance.stop()
+    hash_pool.shutdown()
+    await async_engine.dispose()
+
+
+@app.exception_handler(HashingOverloaded)
+def hashing_overloaded(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+
+# ----------------------------------------------------------
+#                  AUTH ENDPOINTS
+# ----------------------------------------------------------
+
+@app.post("/users/register", response_model=UserRead)
+async def register(user_payload: UserCreate, db=Depends(get_async_db)):
+    hashed_password = await hash_password(user_payload.password)
+    try:
+        user = await crud.create_user(db, user_payload, hashed_password)
+    except crud.DuplicateUser as e:
+        metrics.auth_events.labels("register", "conflict").inc()
+        raise HTTPException(400, str(e))
+    metrics.auth_events.labels("register", "success").inc()
+    return user
+
+
+@app.post("/users/login", response_model=TokenResponse)
+async def login(payload: UserLogin, db=Depends(get_async_db)):
+    user = await crud.get_user_by_username(db, payload.username)
+    if not user or not await verify_password(payload.password, user.hashed_password):
+        metrics.auth_events.labels("login", "failure").inc()
+        raise HTTPException(401, "Invalid credentials")
+
+    metrics.auth_events.labels("login", "success").inc()
+    return {"token": signer.issue(user.id)}
+
+
+@app.post("/users/logout", status_code=204)
+async def logout(claims: dict = Depends(get_token_claims), db=Depends(get_async_db)):
+    await crud.revoke_token(db, claims)
+    revocations.add(claims["jti"], claims["exp"])
+
+
+@app.get("/users/me", response_model=UserRead)
+async def read_current_user(user=Depends(get_current_user_async)):
+    return user
+
+
+# Sync on purpose: merging worker snapshots reads files
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/debug/queries", include_in_schema=querylog.QUERYLOG_DEBUG)
+async def debug_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Statement fingerprints by total time, slow-query count and N+1 suspects."""
+    if not querylog.QUERYLOG_DEBUG:
+        raise HTTPException(404, "Not Found")
+    return querylog.query_stats.snapshot(limit)
+
+
+@app.get("/metrics/hashing")
+async def hashing_metrics():
+    return hash_pool.stats()
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return {"result": result_cache.stats(), "calculation": calculation_cache.stats()}
+
+
+@app.get("/metrics/pool")
+async def pool_metrics():
+    return {
+        "sync": pool_stats["sync"].snapshot(engine.pool),
+        "async": pool_stats["async"].snapshot(async_engine.pool),
+    }
+
+
+@app.get("/metrics/writer")
+async def writer_metrics():
+    # Writes go through aiosqlite / asyncpg here; the SQLite writer queue is sync-only
+    return {"enabled": False}
+
+
+@app.get("/metrics/statement-cache")
+async def statement_cache_metrics():
+    return metrics.statement_cache_stats(async_engine.sync_engine)
+
+
+# ----------------------------------------------------------
+#                  CALCULATION CRUD (BREAD)
+# ----------------------------------------------------------
+
+@app.post("/calculations", response_model=CalculationRead)
+async def add_calculation(payload: CalculationCreate, db=Depends(get_async_db)):
+    try:
+        calc = await crud.create_calculation(db, payload, persist_result=True)
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(400, str(e))
+    return calculation_response(calc)
+
+
+@app.post("/calculations/batch", response_model=CalculationBatchResult)
+async def add_calculations_batch(payload: list[Any] = Body(...), db=Depends(get_async_db)):
+    if len(payload) > BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    created, errors = await crud.create_calculations(db, payload)
+    return batch_response(created, errors)
+
+
+async def _ndjson_calculations(db, after_id):
+    try:
+        async for chunk in crud.stream_calculations(db, after_id, STREAM_CHUNK_SIZE):
+            yield b"".join(dumps(calculation_dict(c)) + b"\n" for c in chunk)
+    finally:
+        await db.close()
+
+
+# The exporter drives a sync server-side cursor: this handler and the
+# stream run on the threadpool against the sync engine (same database).
+@app.get("/calculations/export")
+def export_calculations_endpoint(
+    format: str = Query("csv", pattern="^(csv|ndjson|arrow)$"),
+    compression: Optional[str] = Query(None, pattern="^(gzip|zstd)$"),
+    op_type: Optional[OpType] = None,
+    user_id: Optional[int] = None,
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    db=Depends(get_db),
+):
+    try:
+        body = export_calculations(
+            db, format, compression,
+            op_type=op_type.value if op_type else None,
+            user_id=user_id, min_id=min_id, max_id=max_id,
+            chunk_size=STREAM_CHUNK_SIZE,
+        )
+    except RuntimeError as e:
+        raise HTTPException(400, str(e))
+
+    media_type, filename = content_type(format, compression)
+    return StreamingResponse(
+        close_after(body, db),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/calculations", response_model=CalculationPage)
+async def browse_calculations(
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db=Depends(get_async_db),
+):
+    try:
+        after_id = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_calculations(db, after_id),
+            media_type="application/x-ndjson",
+        )
+
+    items, next_id = await crud.list_calculations(db, limit, after_id)
+    return calculation_page_response(items, encode_cursor(next_id) if next_id is not None else None)
+
+
+@app.delete("/calculations")
+async def bulk_delete_calculations(
+    ids: Optional[list[int]] = Query(None),
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    op_type: Optional[OpType] = None,
+    user_id: Optional[int] = None,
+    older_than: Optional[datetime] = None,
+    db=Depends(get_async_db),
+):
+    try:
+        deleted = await crud.delete_calculations(
+            db, on_chunk=forget_cached,
+            ids=ids, min_id=min_id, max_id=max_id,
+            op_type=op_type.value if op_type else None,
+            user_id=user_id, older_than=older_than,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"deleted": deleted}
+
+
+@app.get("/calculations/{calc_id}", response_model=CalculationRead)
+async def read_calculation(calc_id: int, db=Depends(get_async_db)):
+    cached = calculation_cache.get(calc_id)
+    if cached is not None:
+        return FastResponse(cached)
+
+    # Taken before the read: a PUT/DELETE committing meanwhile moves it
+    version = calculation_cache.version(calc_id)
+    c = await crud.get_calculation_row(db, calc_id)
+    if not c:
+        raise HTTPException(404, "Not found")
+    data = calculation_dict(c)
+    calculation_cache.set_if_unchanged(calc_id, data, version)
+    return FastResponse(data)
+
+
+@app.put("/calculations/{calc_id}", response_model=CalculationRead)
+async def update_calculation(calc_id: int, payload: CalculationCreate, db=Depends(get_async_db)):
+    c = await crud.update_calculation(db, calc_id, payload)
+    if not c:
+        raise HTTPException(404, "Not found")
+    calculation_cache.delete(calc_id)
+    return calculation_response(c)
+
+
+@app.delete("/calculations/{calc_id}")
+async def delete_calculation(calc_id: int, db=Depends(get_async_db)):
+    if not await crud.delete_calculation(db, calc_id):
+        raise HTTPException(404, "Not found")
+    calculation_cache.delete(calc_id)
+    return {"deleted": calc_id}
@@ -1,18 +1,241 @@
-from fastapi import Header, HTTPException
+from datetime import datetime
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy import select
 from typing import Optional
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
 
-def get_current_user(db=Depends(get_db), authorization: Optional[str] = Header(None)):
+from . import async_crud, crud, models
+from .database import DATABASE_URL, get_async_db, get_db
+from .metrics import auth_events
+
+# ------------------------------------------------------------------------
+# Stateless access tokens.
+#
+# Tokens are JWTs (HS256) carrying sub (user id), iat, exp and jti, with the
+# signing key id in the header. They are verified in memory: no query, no
+# cache. AUTH_SIGNING_KEYS lists "kid:secret" pairs; the first signs new
+# tokens and the rest are still accepted, so keys rotate by prepending a new
+# pair and dropping the old one after TOKEN_TTL_SECONDS.
+#
+# Logout adds the jti to the revoked_tokens table and to the in-process
+# RevocationList; other workers pick it up within REVOCATION_SYNC_SECONDS.
+# ------------------------------------------------------------------------
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", "86400"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+AUTH_SIGNING_KEYS = os.getenv("AUTH_SIGNING_KEYS", "")
+# Allows the built-in development key on a server database
+AUTH_DEV_KEYS = os.getenv("AUTH_DEV_KEYS", "false").lower() in ("1", "true", "yes")
+_DEV_SIGNING_KEYS = "dev:insecure-development-key"
+
+logger = logging.getLogger("app.auth")
+if not AUTH_SIGNING_KEYS:
+    # Anyone who knows the development key can mint tokens: only fall back to
+    # it for a local SQLite database or when explicitly asked to
+    if not (AUTH_DEV_KEYS or DATABASE_URL.startswith("sqlite")):
+        raise RuntimeError(
+            "AUTH_SIGNING_KEYS is not set; set it to kid:secret pairs "
+            "(or AUTH_DEV_KEYS=true to use the development key)"
+        )
+    logger.warning("AUTH_SIGNING_KEYS is not set; tokens are signed with a development key")
+    AUTH_SIGNING_KEYS = _DEV_SIGNING_KEYS
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenError(ValueError):
+    def __init__(self, outcome: str, detail: str):
+        self.outcome = outcome
+        super().__init__(detail)
+
+
+class TokenSigner:
+    def __init__(self, keys: str = AUTH_SIGNING_KEYS, ttl: int = TOKEN_TTL_SECONDS):
+        self.ttl = ttl
+        pairs = [pair.split(":", 1) for pair in keys.split(",") if pair.strip()]
+        if not pairs or any(len(pair) != 2 or not pair[1] for pair in pairs):
+            raise ValueError("AUTH_SIGNING_KEYS must be a comma-separated list of kid:secret")
+        self.kid = pairs[0][0].strip()
+        # Encoded header -> key: verification never parses the header JSON
+        self._keys = {}
+        for kid, secret in pairs:
+            header = json.dumps({"alg": "HS256", "kid": kid.strip(), "typ": "JWT"}, separators=(",", ":"))
+            self._keys[_b64encode(header.encode())] = secret.encode()
+        self._header = next(iter(self._keys))
+
+    def issue(self, user_id: int) -> str:
+        now = int(time.time())
+        claims = {"sub": str(user_id), "iat": now, "exp": now + self.ttl, "jti": secrets.token_urlsafe(12)}
+        signing_input = f"{self._header}.{_b64encode(json.dumps(claims, separators=(',', ':')).encode())}"
+        signature = hmac.new(self._keys[self._header], signing_input.encode(), hashlib.sha256).digest()
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    def verify(self, token: str) -> dict:
+        """Return the claims of a valid, unexpired token or raise TokenError."""
+        try:
+            header, payload, signature = token.split(".")
+        except ValueError:
+            raise TokenError("invalid", "Invalid token") from None
+        key = self._keys.get(header)
+        if key is None:
+            raise TokenError("invalid", "Invalid token")
+        expected = hmac.new(key, f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        try:
+            valid = hmac.compare_digest(expected, _b64decode(signature))
+            claims = json.loads(_b64decode(payload)) if valid else None
+        except (ValueError, TypeError):
+            valid = False
+        if not valid or not isinstance(claims, dict):
+            raise TokenError("invalid", "Invalid token")
+        if claims.get("exp", 0) <= time.time():
+            raise TokenError("expired", "Token expired")
+        if claims.get("jti") in revocations:
+            raise TokenError("revoked", "Token revoked")
+        return claims
+
+
+# ------------------------------------------------------------------------
+# Revocation list
+# ------------------------------------------------------------------------
+class RevocationList:
+    """jti -> exp of revoked tokens that have not expired yet."""
+
+    def __init__(self):
+        self._revoked = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti) -> bool:
+        return jti in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, exp: float):
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+
+    def sync(self, db):
+        """Load revocations other workers wrote since the last sync."""
+        rows = db.execute(
+            select(models.RevokedToken.id, models.RevokedToken.jti, models.RevokedToken.expires_at)
+            .where(models.RevokedToken.id > self._last_id)
+            .where(models.RevokedToken.expires_at > datetime.utcnow())
+            .order_by(models.RevokedToken.id)
+        ).all()
+        for row in rows:
+            self.add(row.jti, _timestamp(row.expires_at))
+        if rows:
+            self._last_id = rows[-1].id
+        self.prune()
+
+
+def _timestamp(naive_utc: datetime) -> float:
+    return (naive_utc - datetime(1970, 1, 1)).total_seconds()
+
+
+class RevocationSync:
+    """Background thread running RevocationList.sync every ``interval`` seconds."""
+
+    def __init__(self, session_factory, interval: float = REVOCATION_SYNC_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                db = self.session_factory()
+                try:
+                    revocations.sync(db)
+                finally:
+                    db.close()
+            except Exception:
+                logger.exception("revocation sync failed")
+            self._stop.wait(self.interval)
+
+
+revocations = RevocationList()
+signer = TokenSigner()
+
+
+# ------------------------------------------------------------------------
+# Dependencies
+# ------------------------------------------------------------------------
+def _reject(outcome: str, detail: str) -> HTTPException:
+    auth_events.labels("token", outcome).inc()
+    return HTTPException(status_code=401, detail=detail)
+
+
+def _bearer_token(authorization: Optional[str]) -> str:
     # Expect header: "Bearer <token>"
     if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
+        raise _reject("missing", "Missing authorization header")
     try:
         scheme, token = authorization.split()
     except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
+        raise _reject("malformed", "Invalid authorization header")
     if scheme.lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid auth scheme")
-    user = db.query(models.User).filter(models.User.token == token).first()
+        raise _reject("malformed", "Invalid auth scheme")
+    return token
+
+
+# async without awaits: runs on the event loop, no threadpool hop, in both apps
+async def get_token_claims(authorization: Optional[str] = Header(None)) -> dict:
+    try:
+        claims = signer.verify(_bearer_token(authorization))
+    except TokenError as e:
+        raise _reject(e.outcome, str(e))
+    auth_events.labels("token", "success").inc()
+    return claims
+
+
+async def get_current_user_id(claims: dict = Depends(get_token_claims)) -> int:
+    return int(claims["sub"])
+
+
+get_current_user_id_async = get_current_user_id
+
+
+def get_current_user(user_id: int = Depends(get_current_user_id), db=Depends(get_db)):
+    user = crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
 
+
+async def get_current_user_async(
+    user_id: int = Depends(get_current_user_id), db=Depends(get_async_db)
+):
+    user = await async_crud.get_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user
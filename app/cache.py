@@ -0,0 +1,218 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+_MISSING = object()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis | none
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+_VERSION_TTL = 60  # seconds a delete's version outlives it; far longer than any read-then-set
+
+logger = logging.getLogger("app.cache")
+
+
+class CacheBackend(ABC):
+    """Interface shared by the cache backends; counts hits and misses."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        pass
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def version(self, key: Hashable) -> Any:
+        """Token that changes whenever ``key`` is deleted."""
+        return None
+
+    def set_if_unchanged(self, key: Hashable, value: Any, version: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Cache ``value``, read from the database after ``version = self.version(key)``,
+        unless ``key`` was deleted since. The value is stored first and dropped
+        again if the version moved, so an invalidation racing with this call
+        always wins over the stale read.
+        """
+        self.set(key, value, ttl)
+        if self.version(key) != version:
+            self.delete(key)
+            return False
+        return True
+
+    def _count(self, hit: bool):
+        # Unlocked on purpose: an occasional lost increment is fine for stats
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        # key -> sequence number of its last delete, bounded like the data
+        self._versions: OrderedDict = OrderedDict()
+        self._deletes = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._count(True)
+                    return value
+                del self._data[key]
+        self._count(False)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._versions[key] = next(self._deletes)
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+
+    def version(self, key: Hashable) -> Any:
+        # A forgotten version reads as 0, which never equals a later delete's
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "size": len(self._data), "maxsize": self.maxsize}
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache on a redis-py compatible client (get/set/delete/incr/expire/
+    scan_iter), so invalidations are seen by every worker and replica. Values
+    must be JSON-serializable.
+    """
+
+    def __init__(self, client, prefix: str, ttl: Optional[float] = None):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key: Hashable) -> str:
+        return self.prefix + json.dumps(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        raw = self.client.get(self._key(key))
+        self._count(raw is not None)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self._key(key), json.dumps(value), ex=max(1, math.ceil(ttl)) if ttl else None)
+
+    def delete(self, key: Hashable) -> None:
+        version_key = self.prefix + "version:" + json.dumps(key)
+        self.client.incr(version_key)
+        self.client.expire(version_key, _VERSION_TTL)
+        self.client.delete(self._key(key))
+
+    def version(self, key: Hashable) -> Any:
+        return self.client.get(self.prefix + "version:" + json.dumps(key))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullCache(CacheBackend):
+    """Caching disabled: every lookup misses."""
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._count(False)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+def build_cache(name: str) -> CacheBackend:
+    if CACHE_BACKEND == "none":
+        return NullCache()
+    if CACHE_BACKEND == "redis":
+        import redis  # optional dependency, only needed for the shared backend
+        return RedisCache(redis.Redis.from_url(REDIS_URL), prefix=f"{name}:", ttl=CACHE_TTL_SECONDS)
+    # In-process caches are per worker: a PUT/DELETE handled by another
+    # process is only seen here once the entry's TTL runs out.
+    return LRUCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS)
+
+
+if CACHE_BACKEND == "memory" and WEB_CONCURRENCY > 1:
+    logger.warning(
+        "CACHE_BACKEND=memory with %d workers: each worker caches on its own and does not see "
+        "the others' invalidations for up to CACHE_TTL_SECONDS; set CACHE_BACKEND=redis to share one",
+        WEB_CONCURRENCY,
+    )
+
+# Calculations are pure, so (op_type, a, b) -> result never goes stale
+result_cache = build_cache("result")
+# calc id -> CalculationRead payload, invalidated by PUT and DELETE
+calculation_cache = build_cache("calculation")
@@ -1,91 +1,309 @@
+from pydantic import ValidationError
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models
 from .factory import OperationFactory
+from .hashing import pwd_context
 from .schemas import CalculationCreate, UserCreate
-from passlib.context import CryptContext
-import uuid
+from .tracing import traced
+from datetime import datetime
+from typing import Optional
+import base64
+import re
+
+# Read paths select just these columns: the result is a list of Rows (named
+# tuples) with no ORM instances to build or identity map to maintain.
+CALCULATION_COLUMNS = (
+    models.Calculation.id,
+    models.Calculation.a,
+    models.Calculation.b,
+    models.Calculation.op_type,
+    models.Calculation.result,
+)
+USER_LOGIN_COLUMNS = (
+    models.User.id,
+    models.User.username,
+    models.User.email,
+    models.User.hashed_password,
+)
+USER_READ_COLUMNS = (models.User.id, models.User.username, models.User.email)
+
+# The hot lookups are built once, with bound parameters: a call only binds
+# its values, and the statement always finds its compiled form in the
+# engine's cache (DB_QUERY_CACHE_SIZE) instead of being rebuilt per call.
+CALCULATION_ROW_BY_ID = select(*CALCULATION_COLUMNS).where(models.Calculation.id == bindparam("calc_id"))
+CALCULATION_BY_ID = select(models.Calculation).where(models.Calculation.id == bindparam("calc_id"))
+USER_LOGIN_BY_USERNAME = select(*USER_LOGIN_COLUMNS).where(models.User.username == bindparam("username"))
+USER_READ_BY_ID = select(*USER_READ_COLUMNS).where(models.User.id == bindparam("user_id"))
+
 
 # ------------------------------------------------------------------------
-# Use a stable, dependency-free hashing scheme: pbkdf2_sha256
+# Single-statement writes: INSERT/UPDATE ... RETURNING hands back the
+# written row, so no SELECT follows the write. Dialects without RETURNING
+# (SQLite < 3.35) fall back to a SELECT by primary key.
 # ------------------------------------------------------------------------
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    deprecated="auto"
-)
+def _insert_returning(db: Session, model, values: dict, columns: tuple):
+    stmt = insert(model).values(**values)
+    if db.get_bind().dialect.insert_returning:
+        return db.execute(stmt.returning(*columns)).one()
+    pk = db.execute(stmt).inserted_primary_key[0]
+    return db.execute(select(*columns).where(model.id == pk)).one()
+
+
+def _update_returning(db: Session, model, pk: int, values: dict, columns: tuple):
+    stmt = (
+        update(model)
+        .where(model.id == pk)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(*columns)).first()
+    if db.execute(stmt).rowcount == 0:
+        return None
+    return db.execute(select(*columns).where(model.id == pk)).one()
+
+
+def calculation_values(payload: CalculationCreate) -> dict:
+    op_type = payload.op_type.value
+    return {
+        "a": payload.a,
+        "b": payload.b,
+        "op_type": op_type,
+        "result": OperationFactory.compute(op_type, payload.a, payload.b),
+    }
 
 # ------------------------------------------------------------------------
 # Calculation CRUD
 # ------------------------------------------------------------------------
+@traced
 def create_calculation(db: Session, payload: CalculationCreate, persist_result: bool = True):
-    calc = models.Calculation(
-        a=payload.a,
-        b=payload.b,
-        op_type=payload.op_type.value
-    )
+    """Compute and insert; returns a Row of CALCULATION_COLUMNS (an unsaved Calculation if not persisted)."""
+    values = calculation_values(payload)
+    if not persist_result:
+        return models.Calculation(**values)
 
-    op = OperationFactory.get_operation(calc.op_type)
-    calc.result = op.compute(calc.a, calc.b)
+    row = _insert_returning(db, models.Calculation, values, CALCULATION_COLUMNS)
+    db.commit()
+    return row
 
-    if persist_result:
-        db.add(calc)
-        db.commit()
-        db.refresh(calc)
 
-    return calc
+@traced
+def prepare_calculations(items: list):
+    """
+    Validate and compute a batch of raw calculation payloads. Returns
+    ``(rows, errors)``: insertable column dicts for the valid items and
+    ``{"index", "error"}`` dicts for the rest.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, CalculationCreate.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(err["msg"] for err in e.errors())})
 
+    # Compute each op_type as one column so the vectorized path applies
+    by_op = {}
+    for index, payload in valid:
+        by_op.setdefault(payload.op_type.value, []).append((index, payload))
 
+    results = {}
+    for op_name, group in by_op.items():
+        computed = OperationFactory.compute_many(
+            op_name, [p.a for _, p in group], [p.b for _, p in group]
+        )
+        failed = set(computed.errors)
+        for pos, ((index, _), value) in enumerate(zip(group, computed.tolist())):
+            if pos in failed:
+                errors.append({"index": index, "error": "Division by zero"})
+            else:
+                results[index] = value
+    errors.sort(key=lambda e: e["index"])
+
+    rows = [
+        {"a": p.a, "b": p.b, "op_type": p.op_type.value, "result": results[index]}
+        for index, p in valid
+        if index in results
+    ]
+    return rows, errors
+
+
+def _insert_many_sqlite(db: Session, rows: list) -> list:
+    # SQLite does not promise RETURNING order, so sort_by_parameter_order
+    # would fall back to one INSERT per row. A plain executemany is one
+    # statement, and the ids follow from max(id): the transaction holds the
+    # write lock and rowids are assigned as max + 1, so ours are contiguous.
+    db.execute(insert(models.Calculation), rows)
+    last = db.scalar(select(func.max(models.Calculation.id)))
+    return list(range(last - len(rows) + 1, last + 1))
+
+
+@traced
+def create_calculations(db: Session, items: list):
+    """
+    Validate, compute and insert a batch of raw calculation payloads in one
+    transaction. Invalid items are reported by index instead of aborting the
+    batch. Returns ``(created, errors)`` as plain dicts.
+    """
+    rows, errors = prepare_calculations(items)
+    if not rows:
+        return [], errors
+
+    dialect = db.get_bind().dialect
+    if dialect.name == "sqlite":
+        ids = _insert_many_sqlite(db, rows)
+    elif dialect.insert_executemany_returning:
+        # One multi-row INSERT ... RETURNING per insertmanyvalues page
+        stmt = insert(models.Calculation).returning(
+            models.Calculation.id, sort_by_parameter_order=True
+        )
+        ids = db.scalars(stmt, rows).all()
+    else:
+        objs = [models.Calculation(**row) for row in rows]
+        db.add_all(objs)
+        db.flush()
+        ids = [obj.id for obj in objs]
+
+    db.commit()
+    created = [{"id": calc_id, **row} for calc_id, row in zip(ids, rows)]
+    return created, errors
+
+
+@traced
+def get_calculation_row(db: Session, calc_id: int):
+    """Read-only Row of CALCULATION_COLUMNS, or None."""
+    return db.execute(CALCULATION_ROW_BY_ID, {"calc_id": calc_id}).first()
+
+
+@traced
 def get_calculation(db: Session, calc_id: int):
-    return (
-        db.query(models.Calculation)
-        .filter(models.Calculation.id == calc_id)
-        .first()
+    return db.scalars(CALCULATION_BY_ID, {"calc_id": calc_id}).first()
+
+
+@traced
+def update_calculation(db: Session, calc_id: int, payload: CalculationCreate):
+    """UPDATE ... RETURNING; the updated Row, or None if ``calc_id`` does not exist."""
+    row = _update_returning(db, models.Calculation, calc_id, calculation_values(payload), CALCULATION_COLUMNS)
+    db.commit()
+    return row
+
+
+@traced
+def delete_calculation(db: Session, calc_id: int) -> bool:
+    deleted = db.execute(
+        delete(models.Calculation)
+        .where(models.Calculation.id == calc_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return deleted > 0
+
+
+# ------------------------------------------------------------------------
+# Calculation listing: keyset pagination on Calculation.id
+# ------------------------------------------------------------------------
+def encode_cursor(calc_id: int) -> str:
+    return base64.urlsafe_b64encode(str(calc_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+
+
+@traced
+def list_calculations(db: Session, limit: int, after_id: Optional[int] = None):
+    """Return up to ``limit`` calculations after ``after_id`` plus the next cursor id."""
+    stmt = select(*CALCULATION_COLUMNS).order_by(models.Calculation.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(models.Calculation.id > after_id)
+
+    rows = db.execute(stmt).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def stream_calculations(db: Session, after_id: Optional[int] = None, chunk_size: int = 1000):
+    """Yield lists of CALCULATION_COLUMNS Rows, ``chunk_size`` at a time, in id order."""
+    stmt = (
+        select(*CALCULATION_COLUMNS)
+        .order_by(models.Calculation.id)
+        .execution_options(yield_per=chunk_size)
     )
+    if after_id is not None:
+        stmt = stmt.where(models.Calculation.id > after_id)
+
+    yield from db.execute(stmt).partitions()
 
 
 # ------------------------------------------------------------------------
 # User CRUD + Auth
 # ------------------------------------------------------------------------
-def get_user_by_username(db: Session, username: str):
-    return (
-        db.query(models.User)
-        .filter(models.User.username == username)
-        .first()
-    )
+class DuplicateUser(ValueError):
+    """Username or email already taken (raised from the unique constraint)."""
 
+    def __init__(self, field: str):
+        self.field = field
+        super().__init__(f"{field.capitalize()} already exists")
 
-def create_user(db: Session, user_create: UserCreate):
-    hashed_password = pwd_context.hash(user_create.password)
 
-    user = models.User(
-        username=user_create.username,
-        email=user_create.email,
-        hashed_password=hashed_password,
-    )
+# SQLite: "UNIQUE constraint failed: users.username"; PostgreSQL:
+# "... Key (email)=(someone@example.com) already exists". Only the column
+# token is matched: the value itself may contain "username" or "email".
+_DUPLICATE_USER_FIELD = re.compile(r"\busers\.(username|email)\b|\bkey \((username|email)\)=")
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
 
-    return user
+def duplicate_user_field(error: IntegrityError) -> Optional[str]:
+    match = _DUPLICATE_USER_FIELD.search(str(error.orig).lower())
+    return (match.group(1) or match.group(2)) if match else None
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user:
-        return None
+@traced
+def get_user_by_username(db: Session, username: str):
+    """Row of USER_LOGIN_COLUMNS, or None."""
+    return db.execute(USER_LOGIN_BY_USERNAME, {"username": username}).first()
 
-    if not pwd_context.verify(password, user.hashed_password):
-        return None
 
-    return user
+@traced
+def get_user(db: Session, user_id: int):
+    """Row of USER_READ_COLUMNS, or None."""
+    return db.execute(USER_READ_BY_ID, {"user_id": user_id}).first()
 
 
-def create_user_token(db: Session, user: models.User):
-    token = str(uuid.uuid4())
-    user.token = token
+@traced
+def create_user(db: Session, user_create: UserCreate, hashed_password: Optional[str] = None):
+    # Request handlers hash through app.hashing's pool and pass the result in
+    if hashed_password is None:
+        hashed_password = pwd_context.hash(user_create.password)
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # No existence check first: the unique indexes decide, race-free
+    try:
+        user = _insert_returning(db, models.User, {
+            "username": user_create.username,
+            "email": user_create.email,
+            "hashed_password": hashed_password,
+        }, USER_READ_COLUMNS)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        field = duplicate_user_field(e)
+        if field is None:
+            raise
+        raise DuplicateUser(field) from None
 
-    return token
+    return user
+
+
+@traced
+def revoke_token(db: Session, claims: dict):
+    """Persist a logout so every worker rejects the token until it expires."""
+    db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= datetime.utcnow()))
+    db.execute(insert(models.RevokedToken).values(
+        jti=claims["jti"], expires_at=datetime.utcfromtimestamp(claims["exp"])
+    ))
+    db.commit()
@@ -0,0 +1,192 @@
+from contextvars import ContextVar
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from typing import Optional
+import asyncio
+import functools
+import os
+
+from . import sqlite_tuning
+from .metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+
+# An async driver in DATABASE_URL (postgresql+asyncpg, sqlite+aiosqlite)
+# selects async mode: app.async_main serves requests on the AsyncEngine,
+# while the sync engine below uses the matching sync driver for tooling.
+_url = make_url(DATABASE_URL)
+ASYNC_MODE = _url.get_dialect().is_async
+SYNC_DATABASE_URL = _url.set(drivername=_url.get_backend_name()) if ASYNC_MODE else _url
+
+# --- Pool and statement cache settings ---
+# Size pools so replicas * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the
+# server's max_connections. Pre-ping costs a round trip per checkout, so it
+# is off by default and DB_POOL_RECYCLE retires connections before typical
+# server/proxy idle timeouts instead.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# Compiled SQL cache entries per engine; a miss costs a full statement
+# compilation. Watch hit_rate at GET /metrics/statement-cache.
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+
+def _pool_kwargs(poolclass) -> dict:
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # In-memory SQLite keeps its default single-connection pool
+    if _url.get_backend_name() == "sqlite" and _url.database in (None, "", ":memory:"):
+        return kwargs
+    kwargs.update(
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return kwargs
+
+
+# --- Engine setup ---
+connect_args = {}
+if DATABASE_URL.startswith("sqlite"):
+    connect_args["check_same_thread"] = False
+else:
+    connect_args["connect_timeout"] = 5
+
+engine = create_engine(
+    SYNC_DATABASE_URL,
+    connect_args=connect_args,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    **_pool_kwargs(InstrumentedQueuePool),
+)
+# SQLite only: PRAGMA profile on every new connection (see app.sqlite_tuning)
+sqlite_tuning.install(engine)
+
+# Committed objects keep their loaded state; writes return fresh rows via
+# RETURNING, so nothing needs a reload after commit
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+# --- Async engine setup (only in async mode) ---
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_MODE:
+    async_connect_args = {} if DATABASE_URL.startswith("sqlite") else {"timeout": 5}
+    async_engine = create_async_engine(
+        DATABASE_URL,
+        connect_args=async_connect_args,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        **_pool_kwargs(InstrumentedAsyncQueuePool),
+    )
+    sqlite_tuning.install(async_engine)
+    # Async sessions cannot lazy-load expired attributes after commit
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+# --- DB dependency ---
+# get_db / get_async_db hand out a lazy proxy: the Session (and with it a
+# pooled connection) is only created when a handler first touches it, so
+# cache hits and requests rejected by validation never check one out.
+# SessionRoute closes every request session as soon as the endpoint returns,
+# before the response is serialized; anything used after that (a streamed
+# body) transparently opens a new session and closes it itself.
+_request_sessions: ContextVar[Optional[list]] = ContextVar("request_sessions", default=None)
+
+
+class LazySession:
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def close(self):
+        session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+class LazyAsyncSession(LazySession):
+    __slots__ = ()
+
+    async def close(self):
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+
+
+def _track(db):
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(db)
+    return db
+
+
+def get_db():
+    db = _track(LazySession(SessionLocal))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    db = _track(LazyAsyncSession(AsyncSessionLocal))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def _releasing_endpoint(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                for db in _request_sessions.get() or ():
+                    closed = db.close()
+                    if closed is not None:
+                        await closed
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                for db in _request_sessions.get() or ():
+                    if not isinstance(db, LazyAsyncSession):
+                        db.close()
+    return wrapper
+
+
+class SessionRoute(APIRoute):
+    """Releases the request's sessions when the endpoint returns."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _releasing_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def session_handler(request):
+            token = _request_sessions.set([])
+            try:
+                return await handler(request)
+            finally:
+                _request_sessions.reset(token)
+
+        return session_handler
@@ -0,0 +1,186 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Iterable, Iterator, Optional
+import csv
+import importlib
+import io
+import json
+import os
+import zlib
+
+from . import models
+
+# ------------------------------------------------------------------------
+# Streaming export of calculations as CSV, NDJSON or Arrow IPC.
+#
+# Rows come from a server-side cursor (yield_per) as plain column tuples
+# and are encoded chunk by chunk, optionally compressed on the fly, so
+# memory stays constant whatever the table size.
+# ------------------------------------------------------------------------
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+
+_COLUMNS = (
+    models.Calculation.id,
+    models.Calculation.a,
+    models.Calculation.b,
+    models.Calculation.op_type,
+    models.Calculation.result,
+    models.Calculation.user_id,
+)
+FIELDS = tuple(c.key for c in _COLUMNS)
+
+
+def _require(module: str, purpose: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise RuntimeError(f"{purpose} requires {module} (pip install {module})") from None
+
+
+def iter_rows(
+    db: Session,
+    op_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[list]:
+    """Yield lists of row tuples (see FIELDS) ordered by id; id bounds are inclusive."""
+    stmt = select(*_COLUMNS).order_by(models.Calculation.id)
+    if op_type is not None:
+        stmt = stmt.where(models.Calculation.op_type == op_type)
+    if user_id is not None:
+        stmt = stmt.where(models.Calculation.user_id == user_id)
+    if min_id is not None:
+        stmt = stmt.where(models.Calculation.id >= min_id)
+    if max_id is not None:
+        stmt = stmt.where(models.Calculation.id <= max_id)
+
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def encode_csv(chunks: Iterable[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def encode_ndjson(chunks: Iterable[list]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(FIELDS, row)), separators=(",", ":")) + "\n" for row in chunk
+        ).encode()
+
+
+def encode_arrow(chunks: Iterable[list]) -> Iterator[bytes]:
+    pa = _require("pyarrow", "Arrow export")
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("a", pa.float64()),
+        ("b", pa.float64()),
+        ("op_type", pa.string()),
+        ("result", pa.float64()),
+        ("user_id", pa.int64()),
+    ])
+    sink = _DrainSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(zip(*chunk), schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only file that hands its buffered bytes out on drain()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def compress(stream: Iterable[bytes], compression: Optional[str]) -> Iterator[bytes]:
+    if compression is None:
+        yield from stream
+        return
+
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    elif compression == "zstd":
+        compressor = _require("zstandard", "zstd compression").ZstdCompressor().compressobj()
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    for data in stream:
+        out = compressor.compress(data)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+_ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson, "arrow": encode_arrow}
+
+
+def export_calculations(db: Session, fmt: str, compression: Optional[str] = None, **filters) -> Iterator[bytes]:
+    """Stream the filtered calculations encoded as ``fmt``; filters go to iter_rows."""
+    # Fail before the first byte is sent rather than halfway through a response
+    if fmt == "arrow":
+        _require("pyarrow", "Arrow export")
+    if compression == "zstd":
+        _require("zstandard", "zstd compression")
+    return compress(_ENCODERS[fmt](iter_rows(db, **filters)), compression)
+
+
+def content_type(fmt: str, compression: Optional[str] = None) -> tuple:
+    """``(media_type, filename)`` for a download of ``fmt``, optionally compressed."""
+    media_type, filename = FORMATS[fmt][0], f"calculations.{FORMATS[fmt][1]}"
+    if compression:
+        media_type, filename = COMPRESSIONS[compression][0], f"{filename}.{COMPRESSIONS[compression][1]}"
+    return media_type, filename
+
+
+def close_after(stream: Iterable[bytes], db) -> Iterator[bytes]:
+    # The request's session is released before the body is streamed, so the
+    # stream re-opens it lazily and this closes it once the cursor drains.
+    try:
+        yield from stream
+    finally:
+        db.close()
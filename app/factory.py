@@ -1,28 +1,88 @@
 from abc import ABC, abstractmethod
+from typing import NamedTuple, Sequence
+
+from .cache import result_cache
+from .metrics import calculations
+from .timing import phase
+from .tracing import span
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; compute_many falls back to pure Python
+    np = None
+
+
+class ComputeResult(NamedTuple):
+    # values[i] is NaN for every index listed in errors
+    values: Sequence[float]
+    errors: list[int]
+
+    def tolist(self) -> list[float]:
+        if np is not None and isinstance(self.values, np.ndarray):
+            return self.values.tolist()
+        return list(self.values)
+
 
 class Operation(ABC):
     @abstractmethod
     def compute(self, a: float, b: float) -> float:
         pass
 
+    def compute_many(self, a: Sequence[float], b: Sequence[float]) -> ComputeResult:
+        if len(a) != len(b):
+            raise ValueError('Operand columns must have the same length')
+        if np is not None:
+            return self._compute_array(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+        return self._compute_list(a, b)
+
+    def _compute_array(self, a, b) -> ComputeResult:
+        return self._compute_list(a.tolist(), b.tolist())
+
+    def _compute_list(self, a, b) -> ComputeResult:
+        values, errors = [], []
+        for i, (x, y) in enumerate(zip(a, b)):
+            try:
+                values.append(self.compute(x, y))
+            except ZeroDivisionError:
+                values.append(float('nan'))
+                errors.append(i)
+        return ComputeResult(values, errors)
+
 class Add(Operation):
     def compute(self, a, b):
         return a + b
 
+    def _compute_array(self, a, b):
+        return ComputeResult(a + b, [])
+
 class Sub(Operation):
     def compute(self, a, b):
         return a - b
 
+    def _compute_array(self, a, b):
+        return ComputeResult(a - b, [])
+
 class Multiply(Operation):
     def compute(self, a, b):
         return a * b
 
+    def _compute_array(self, a, b):
+        return ComputeResult(a * b, [])
+
 class Divide(Operation):
     def compute(self, a, b):
         if b == 0:
             raise ZeroDivisionError('Division by zero')
         return a / b
 
+    def _compute_array(self, a, b):
+        zero = b == 0
+        if not zero.any():
+            return ComputeResult(a / b, [])
+        # Masked policy: skip zero divisors, leave NaN there and report the indices
+        values = np.divide(a, b, out=np.full_like(a, np.nan), where=~zero)
+        return ComputeResult(values, np.flatnonzero(zero).tolist())
+
 class OperationFactory:
     mapping = {
         'Add': Add,
@@ -30,10 +90,37 @@ class OperationFactory:
         'Multiply': Multiply,
         'Divide': Divide,
     }
+    # Operations are stateless, so one instance per name is shared
+    _instances: dict = {}
 
     @classmethod
     def get_operation(cls, op_name: str) -> Operation:
-        op_cls = cls.mapping.get(op_name)
-        if not op_cls:
-            raise ValueError(f'Unknown operation: {op_name}')
-        return op_cls()
+        op = cls._instances.get(op_name)
+        if op is None:
+            op_cls = cls.mapping.get(op_name)
+            if not op_cls:
+                raise ValueError(f'Unknown operation: {op_name}')
+            op = cls._instances[op_name] = op_cls()
+        return op
+
+    @classmethod
+    def compute_many(cls, op_name: str, a: Sequence[float], b: Sequence[float]) -> ComputeResult:
+        with phase("compute"), span("compute_many", op_type=op_name, rows=len(a)):
+            computed = cls.get_operation(op_name).compute_many(a, b)
+        calculations.labels(op_name).inc(len(a) - len(computed.errors))
+        return computed
+
+    @classmethod
+    def compute(cls, op_name: str, a: float, b: float) -> float:
+        # Operations are pure, so results are shared through the result cache
+        key = (op_name, a, b)
+        with span("compute", op_type=op_name) as compute_span:
+            result = result_cache.get(key)
+            if compute_span is not None:
+                compute_span.attributes["cache_hit"] = result is not None
+            if result is None:
+                with phase("compute"):
+                    result = cls.get_operation(op_name).compute(a, b)
+                result_cache.set(key, result)
+        calculations.labels(op_name).inc()
+        return result
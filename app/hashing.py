@@ -0,0 +1,115 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from passlib.context import CryptContext
+from typing import Optional
+import asyncio
+import multiprocessing
+import os
+import threading
+
+# ------------------------------------------------------------------------
+# Use a stable, dependency-free hashing scheme: pbkdf2_sha256
+# ------------------------------------------------------------------------
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto"
+)
+
+# Sized independently of the web workers. 0 runs hashing on the event
+# loop's default thread executor instead of a process pool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Requests allowed in flight (running + queued) before new ones are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class HashingPool:
+    """
+    Bounded pool for pbkdf2 work. Admission is a plain counter so it does not
+    depend on any particular event loop; callers over ``max_pending`` get
+    HashingOverloaded immediately instead of queueing behind the burst.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0  # raised or cancelled
+        self._rejected = 0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self._rejected += 1
+                raise HashingOverloaded("Password hashing is overloaded, retry shortly")
+            self._in_flight += 1
+        try:
+            # Imported here: pool workers import this module to unpickle
+            # _hash/_verify and should not pay for FastAPI/SQLAlchemy
+            from .timing import phase
+
+            loop = asyncio.get_running_loop()
+            with phase("hash"):
+                result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - max(1, self.workers)),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hash_pool = HashingPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(_verify, password, hashed_password)
@@ -0,0 +1,199 @@
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from typing import Callable, IO, Iterable, Iterator, Optional
+import csv
+import io
+import os
+import time
+
+from . import models
+from .factory import OperationFactory
+from .schemas import OpType
+
+# ------------------------------------------------------------------------
+# Bulk import of calculations from CSV or Parquet.
+#
+# Rows are read in chunks, validated with the same rules as
+# CalculationCreate, computed per op_type with OperationFactory.compute_many
+# and written with COPY (psycopg2) or one executemany INSERT per chunk.
+# Each chunk commits on its own so a long backfill can be resumed.
+# ------------------------------------------------------------------------
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "50000"))
+
+# Unreadable input: missing pyarrow, bad encoding, malformed CSV or Parquet
+# (Arrow errors are re-raised as ValueError)
+INPUT_ERRORS = (RuntimeError, ValueError, UnicodeDecodeError, csv.Error)
+
+COLUMNS = ("a", "b", "op_type")
+_OP_TYPES = {op.value for op in OpType}
+_COPY_SQL = "COPY calculations (a, b, op_type, result, user_id, created_at) FROM STDIN WITH (FORMAT csv)"
+
+
+def iter_csv_chunks(lines: Iterable[str], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[list]:
+    """Yield lists of row dicts from CSV text with an ``a,b,op_type`` header."""
+    chunk = []
+    for row in csv.DictReader(lines):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_parquet_chunks(source, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[list]:
+    """Yield lists of row dicts from a Parquet path or binary file object."""
+    try:
+        import pyarrow.parquet as pq
+        from pyarrow import ArrowException
+    except ImportError:
+        raise RuntimeError("Parquet import requires pyarrow (pip install pyarrow)") from None
+
+    try:
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size, columns=list(COLUMNS))
+        for batch in batches:
+            yield batch.to_pylist()
+    except ArrowException as e:
+        raise ValueError(f"Invalid Parquet file: {e}") from None
+
+
+class ImportFailed(ValueError):
+    """Input became unreadable mid-import; ``report`` covers the committed chunks."""
+
+    def __init__(self, message: str, report: dict):
+        super().__init__(message)
+        self.report = report
+
+
+def _parse_row(row: dict):
+    # Same rules as CalculationCreate, without building a model per row
+    try:
+        a, b = float(row["a"]), float(row["b"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("a and b must be numbers") from None
+    op_type = row.get("op_type")
+    if op_type not in _OP_TYPES:
+        raise ValueError(f"Unknown operation: {op_type}")
+    if op_type == OpType.Divide.value and b == 0:
+        raise ValueError("Division by zero is not allowed.")
+    return a, b, op_type
+
+
+def _compute_chunk(parsed: list) -> list:
+    by_op = {}
+    for i, (_, _, op_type) in enumerate(parsed):
+        by_op.setdefault(op_type, []).append(i)
+
+    results = [None] * len(parsed)
+    for op_type, idx in by_op.items():
+        computed = OperationFactory.compute_many(
+            op_type, [parsed[i][0] for i in idx], [parsed[i][1] for i in idx]
+        )
+        for i, value in zip(idx, computed.tolist()):
+            results[i] = value
+    return results
+
+
+def _write_rows(db: Session, rows: list):
+    if db.get_bind().dialect.driver == "psycopg2":
+        buf = io.StringIO()
+        csv.writer(buf).writerows(
+            (r["a"], r["b"], r["op_type"], r["result"], r["user_id"], r["created_at"]) for r in rows
+        )
+        buf.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(_COPY_SQL, buf)
+        finally:
+            cursor.close()
+    else:
+        db.execute(insert(models.Calculation.__table__), rows)
+    db.commit()
+
+
+def import_calculations(
+    db: Session,
+    chunks: Iterable[list],
+    bad_rows: Optional[IO[str]] = None,
+    keep_bad_rows: int = 0,
+    user_id: Optional[int] = None,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Import row-dict chunks (see iter_csv_chunks / iter_parquet_chunks).
+    Rejected rows are written to ``bad_rows`` as CSV with their 1-based row
+    number and the reason; the first ``keep_bad_rows`` of them are also
+    returned in the report's ``bad_rows``. Returns the import report; input
+    that becomes unreadable partway raises ImportFailed with the report of
+    the chunks already committed.
+    """
+    report = {"rows_read": 0, "rows_written": 0, "rows_rejected": 0, "last_committed_row": 0}
+    kept = []
+    bad_writer = None
+    start = time.perf_counter()
+
+    try:
+        for chunk in chunks:
+            parsed = []
+            for offset, row in enumerate(chunk, start=report["rows_read"] + 1):
+                try:
+                    parsed.append(_parse_row(row))
+                except ValueError as e:
+                    report["rows_rejected"] += 1
+                    if len(kept) < keep_bad_rows:
+                        kept.append({"row": offset, **{c: _text(row.get(c)) for c in COLUMNS}, "error": str(e)})
+                    if bad_rows is not None:
+                        if bad_writer is None:
+                            bad_writer = csv.writer(bad_rows)
+                            bad_writer.writerow(("row",) + COLUMNS + ("error",))
+                        bad_writer.writerow((offset,) + tuple(row.get(c) for c in COLUMNS) + (str(e),))
+            report["rows_read"] += len(chunk)
+
+            if parsed:
+                results = _compute_chunk(parsed)
+                now = datetime.utcnow()
+                _write_rows(db, [
+                    {"a": a, "b": b, "op_type": op_type, "result": result, "user_id": user_id, "created_at": now}
+                    for (a, b, op_type), result in zip(parsed, results)
+                ])
+                report["rows_written"] += len(parsed)
+
+            # Everything up to here is committed: a retry resumes after this row
+            report["last_committed_row"] = report["rows_read"]
+
+            if progress is not None:
+                progress(_finish(report, start))
+    except INPUT_ERRORS as e:
+        # Earlier chunks stay committed; say how far the import got
+        failed = _finish(report, start)
+        if keep_bad_rows:
+            failed["bad_rows"] = kept
+        raise ImportFailed(str(e), failed) from e
+
+    report = _finish(report, start)
+    if keep_bad_rows:
+        report["bad_rows"] = kept
+    return report
+
+
+def import_file(db: Session, fileobj: IO[bytes], fmt: str, chunk_size: int = IMPORT_CHUNK_SIZE, **kwargs) -> dict:
+    """Import a binary CSV or Parquet file object; kwargs go to import_calculations."""
+    if fmt == "parquet":
+        chunks = iter_parquet_chunks(fileobj, chunk_size)
+    else:
+        chunks = iter_csv_chunks(io.TextIOWrapper(fileobj, encoding="utf-8", newline=""), chunk_size)
+    return import_calculations(db, chunks, **kwargs)
+
+
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _finish(report: dict, start: float) -> dict:
+    seconds = time.perf_counter() - start
+    return {
+        **report,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(report["rows_written"] / seconds, 1) if seconds else 0.0,
+    }
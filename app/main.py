@@ -1,37 +1,90 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime
+from typing import Any, Optional
 import os
-
-from .models import Base, Calculation, User
-from .schemas import CalculationCreate, CalculationRead, UserCreate, UserRead, UserLogin, TokenResponse
+import tempfile
+
+from . import metrics, querylog, timing, tracing
+from .auth import get_current_user, get_token_claims, revocations, signer
+from .cache import calculation_cache, result_cache
+from .database import DATABASE_URL, engine, SessionLocal, get_db
+from .writer import SQLITE_WRITER, WriteQueue
+from .exporter import close_after, content_type, export_calculations
+from .hashing import HashingOverloaded, hash_pool, hash_password, verify_password
+from .importer import INPUT_ERRORS, ImportFailed, import_file
+from .migrations import upgrade
+from .services import (
+    BATCH_MAX_ITEMS,
+    STREAM_CHUNK_SIZE,
+    forget_cached,
+    retention_job,
+    revocation_sync,
+    sqlite_maintenance,
+)
+from .metrics import pool_stats
+from .models import Base
+from .retention import delete_calculations
+from .serialization import (
+    FastResponse,
+    batch_response,
+    calculation_dict,
+    calculation_page_response,
+    calculation_response,
+    dumps,
+)
+from .schemas import (
+    CalculationCreate,
+    CalculationRead,
+    CalculationPage,
+    CalculationBatchResult,
+    ImportReport,
+    OpType,
+    UserCreate,
+    UserRead,
+    UserLogin,
+    TokenResponse,
+)
 from .crud import (
     create_calculation,
-    get_calculation,
+    create_calculations,
+    get_calculation_row,
+    update_calculation,
+    delete_calculation,
+    list_calculations,
+    stream_calculations,
+    encode_cursor,
+    decode_cursor,
+    get_user_by_username,
     create_user,
-    authenticate_user,
-    create_user_token,
+    revoke_token,
+    DuplicateUser,
 )
-from .factory import OperationFactory  # If you use factory pattern
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# Uploads larger than this spill from memory to a temporary file
+IMPORT_SPOOL_MAX_MEMORY = int(os.getenv("IMPORT_SPOOL_MAX_MEMORY", str(16 * 1024 * 1024)))
+IMPORT_BAD_ROWS_MAX = int(os.getenv("IMPORT_BAD_ROWS_MAX", "100"))  # rejected rows echoed in the report
 
-# --- Engine setup ---
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
-else:
-    connect_args["connect_timeout"] = 5
+app = FastAPI(title="Calculation Service (for assignment)", default_response_class=FastResponse)
+timing.install(app)
+metrics.install(app)
+tracing.install(app)
+querylog.install(app)
+metrics.registry.set_collector("runtime", metrics.runtime_collector(
+    {"sync": engine.pool}, hash_pool, {"result": result_cache, "calculation": calculation_cache}
+))
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-)
 
-SessionLocal = sessionmaker(bind=engine)
+# With SQLITE_WRITER, request writes go through one writer thread (see app.writer)
+sqlite_writer = WriteQueue(SessionLocal) if SQLITE_WRITER and DATABASE_URL.startswith("sqlite") else None
+
 
-app = FastAPI(title="Calculation Service (for assignment)")
+def write(db, fn, *args):
+    """Run the crud write ``fn(db, *args)``, on the SQLite writer thread when it is enabled."""
+    if sqlite_writer is None:
+        return fn(db, *args)
+    return sqlite_writer.run(fn, *args)
 
 
 # --- Startup ---
@@ -40,37 +93,111 @@ def startup():
     # SQLite auto-create for local dev
     if DATABASE_URL.startswith("sqlite"):
         Base.metadata.create_all(bind=engine)
+    # Columns and tables added since the database was created (app.migrations)
+    with engine.begin() as conn:
+        upgrade(conn)
+    retention_job.start()
+    revocation_sync.start()
+    sqlite_maintenance.start()
 
 
-# --- DB dependency ---
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@app.on_event("shutdown")
+def shutdown():
+    retention_job.stop()
+    revocation_sync.stop()
+    sqlite_maintenance.stop()
+    if sqlite_writer is not None:
+        sqlite_writer.stop()
+    hash_pool.shutdown()
+
+
+@app.exception_handler(HashingOverloaded)
+def hashing_overloaded(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
 
 # ----------------------------------------------------------
 #                  AUTH ENDPOINTS
 # ----------------------------------------------------------
 
-@app.post("/users/register", response_model=UserRead)
-def register(user_payload: UserCreate, db=Depends(get_db)):
-    if db.query(User).filter(User.username == user_payload.username).first():
-        raise HTTPException(400, "Username already exists")
+# These handlers are async so pbkdf2 runs in app.hashing's process pool while
+# the event loop keeps serving other routes; DB calls stay on the threadpool.
 
-    return create_user(db, user_payload)
+@app.post("/users/register", response_model=UserRead)
+async def register(user_payload: UserCreate, db=Depends(get_db)):
+    hashed_password = await hash_password(user_payload.password)
+    try:
+        if sqlite_writer is None:
+            user = await run_in_threadpool(create_user, db, user_payload, hashed_password)
+        else:
+            user = await sqlite_writer.run_async(create_user, user_payload, hashed_password)
+    except DuplicateUser as e:
+        metrics.auth_events.labels("register", "conflict").inc()
+        raise HTTPException(400, str(e))
+    metrics.auth_events.labels("register", "success").inc()
+    return user
 
 
 @app.post("/users/login", response_model=TokenResponse)
-def login(payload: UserLogin, db=Depends(get_db)):
-    user = authenticate_user(db, payload.username, payload.password)
-    if not user:
+async def login(payload: UserLogin, db=Depends(get_db)):
+    user = await run_in_threadpool(get_user_by_username, db, payload.username)
+    if not user or not await verify_password(payload.password, user.hashed_password):
+        metrics.auth_events.labels("login", "failure").inc()
         raise HTTPException(401, "Invalid credentials")
 
-    token = create_user_token(db, user)
-    return {"token": token}
+    metrics.auth_events.labels("login", "success").inc()
+    return {"token": signer.issue(user.id)}
+
+
+@app.post("/users/logout", status_code=204)
+def logout(claims: dict = Depends(get_token_claims), db=Depends(get_db)):
+    write(db, revoke_token, claims)
+    revocations.add(claims["jti"], claims["exp"])
+
+
+@app.get("/users/me", response_model=UserRead)
+def read_current_user(user=Depends(get_current_user)):
+    return user
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/debug/queries", include_in_schema=querylog.QUERYLOG_DEBUG)
+def debug_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Statement fingerprints by total time, slow-query count and N+1 suspects."""
+    if not querylog.QUERYLOG_DEBUG:
+        raise HTTPException(404, "Not Found")
+    return querylog.query_stats.snapshot(limit)
+
+
+@app.get("/metrics/hashing")
+def hashing_metrics():
+    return hash_pool.stats()
+
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    return {"result": result_cache.stats(), "calculation": calculation_cache.stats()}
+
+
+@app.get("/metrics/pool")
+def pool_metrics():
+    return {"sync": pool_stats["sync"].snapshot(engine.pool)}
+
+
+@app.get("/metrics/statement-cache")
+def statement_cache_metrics():
+    return metrics.statement_cache_stats(engine)
+
+
+@app.get("/metrics/writer")
+def writer_metrics():
+    if sqlite_writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **sqlite_writer.stats()}
 
 
 # ----------------------------------------------------------
@@ -80,50 +207,149 @@ def login(payload: UserLogin, db=Depends(get_db)):
 @app.post("/calculations", response_model=CalculationRead)
 def add_calculation(payload: CalculationCreate, db=Depends(get_db)):
     try:
-        calc = create_calculation(db, payload, persist_result=True)
-        return calc
-    except Exception as e:
+        calc = write(db, create_calculation, payload, True)
+    except (ValueError, ZeroDivisionError) as e:
+        raise HTTPException(400, str(e))
+    return calculation_response(calc)
+
+
+@app.post("/calculations/batch", response_model=CalculationBatchResult)
+def add_calculations_batch(payload: list[Any] = Body(...), db=Depends(get_db)):
+    if len(payload) > BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    created, errors = write(db, create_calculations, payload)
+    return batch_response(created, errors)
+
+
+@app.post("/calculations/import", response_model=ImportReport)
+async def import_calculations_upload(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    db=Depends(get_db),
+):
+    # Stream the raw request body (text/csv or Parquet bytes) into a spooled
+    # file; Parquet needs random access to its footer anyway.
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MAX_MEMORY) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await run_in_threadpool(
+                import_file, db, upload, format, keep_bad_rows=IMPORT_BAD_ROWS_MAX
+            )
+        except ImportFailed as e:
+            # Chunks before the failure are committed: resume after last_committed_row
+            raise HTTPException(400, {"error": str(e), "report": e.report})
+        except INPUT_ERRORS as e:
+            raise HTTPException(400, str(e))
+
+
+@app.get("/calculations/export")
+def export_calculations_endpoint(
+    format: str = Query("csv", pattern="^(csv|ndjson|arrow)$"),
+    compression: Optional[str] = Query(None, pattern="^(gzip|zstd)$"),
+    op_type: Optional[OpType] = None,
+    user_id: Optional[int] = None,
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    db=Depends(get_db),
+):
+    try:
+        body = export_calculations(
+            db, format, compression,
+            op_type=op_type.value if op_type else None,
+            user_id=user_id, min_id=min_id, max_id=max_id,
+            chunk_size=STREAM_CHUNK_SIZE,
+        )
+    except RuntimeError as e:
         raise HTTPException(400, str(e))
 
+    media_type, filename = content_type(format, compression)
+    return StreamingResponse(
+        close_after(body, db),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/calculations", response_model=CalculationPage)
+def browse_calculations(
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db=Depends(get_db),
+):
+    try:
+        after_id = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
-@app.get("/calculations", response_model=list[CalculationRead])
-def browse_calculations(db=Depends(get_db)):
-    return db.query(Calculation).all()
+    if format == "ndjson":
+        # Same fields as the JSON page items (CalculationRead), unlike /calculations/export
+        chunks = stream_calculations(db, after_id, STREAM_CHUNK_SIZE)
+        return StreamingResponse(
+            close_after((b"".join(dumps(calculation_dict(c)) + b"\n" for c in chunk) for chunk in chunks), db),
+            media_type="application/x-ndjson",
+        )
+
+    items, next_id = list_calculations(db, limit, after_id)
+    return calculation_page_response(items, encode_cursor(next_id) if next_id is not None else None)
+
+
+@app.delete("/calculations")
+def bulk_delete_calculations(
+    ids: Optional[list[int]] = Query(None),
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    op_type: Optional[OpType] = None,
+    user_id: Optional[int] = None,
+    older_than: Optional[datetime] = None,
+    db=Depends(get_db),
+):
+    """Delete every calculation matching all given filters, in chunks; at least one filter is required."""
+    try:
+        deleted = delete_calculations(
+            db, on_chunk=forget_cached,
+            ids=ids, min_id=min_id, max_id=max_id,
+            op_type=op_type.value if op_type else None,
+            user_id=user_id, older_than=older_than,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"deleted": deleted}
 
 
 @app.get("/calculations/{calc_id}", response_model=CalculationRead)
 def read_calculation(calc_id: int, db=Depends(get_db)):
-    c = get_calculation(db, calc_id)
+    cached = calculation_cache.get(calc_id)
+    if cached is not None:
+        return FastResponse(cached)
+
+    # Taken before the read: a PUT/DELETE committing meanwhile moves it
+    version = calculation_cache.version(calc_id)
+    c = get_calculation_row(db, calc_id)
     if not c:
         raise HTTPException(404, "Not found")
-    return c
+    data = calculation_dict(c)
+    calculation_cache.set_if_unchanged(calc_id, data, version)
+    return FastResponse(data)
 
 
 @app.put("/calculations/{calc_id}", response_model=CalculationRead)
-def update_calculation(calc_id: int, payload: CalculationCreate, db=Depends(get_db)):
-    c = get_calculation(db, calc_id)
+def update_calculation_endpoint(calc_id: int, payload: CalculationCreate, db=Depends(get_db)):
+    c = write(db, update_calculation, calc_id, payload)
     if not c:
         raise HTTPException(404, "Not found")
-
-    c.a = payload.a
-    c.b = payload.b
-    c.op_type = payload.op
-    c.result = OperationFactory.get_operation(payload.op).compute(payload.a, payload.b)
-
-    db.add(c)
-    db.commit()
-    db.refresh(c)
-    return c
+    calculation_cache.delete(calc_id)
+    return calculation_response(c)
 
 
 @app.delete("/calculations/{calc_id}")
-def delete_calculation(calc_id: int, db=Depends(get_db)):
-    c = get_calculation(db, calc_id)
-    if not c:
+def delete_calculation_endpoint(calc_id: int, db=Depends(get_db)):
+    if not write(db, delete_calculation, calc_id):
         raise HTTPException(404, "Not found")
-
-    db.delete(c)
-    db.commit()
+    calculation_cache.delete(calc_id)
     return {"deleted": calc_id}
 
 
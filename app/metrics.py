@@ -0,0 +1,475 @@
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Optional, Sequence
+import atexit
+import json
+import os
+import threading
+import time
+
+from . import sqlhooks
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = running
+        return {"buckets": cumulative, "sum": total, "count": running}
+
+
+# ------------------------------------------------------------------------
+# Connection pool metrics
+# ------------------------------------------------------------------------
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.overflow_checkouts = 0
+        self.checkout_latency = Histogram()
+        self.hold_time = Histogram()
+        self._lock = threading.Lock()
+
+    def record_checkout(self, seconds: float, waited: bool, overflowed: bool):
+        self.checkout_latency.observe(seconds)
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.overflow_checkouts += overflowed
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "overflow_checkouts": self.overflow_checkouts,
+            "checkout_latency_seconds": self.checkout_latency.snapshot(),
+            "hold_seconds": self.hold_time.snapshot(),
+        }
+
+
+pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+
+
+class _TimedCheckout:
+    # Times QueuePool._do_get, i.e. the wait for a pooled (or new overflow)
+    # connection, which SQLAlchemy's pool events do not expose, and how long
+    # each checkout holds its connection until _do_return_conn.
+    stats_key = "sync"
+
+    def _do_get(self):
+        # overflow() is negative until pool_size connections exist
+        beyond_size = self.checkedin() == 0 and self.overflow() >= 0
+        waited = beyond_size and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        finally:
+            pool_stats[self.stats_key].record_checkout(
+                time.perf_counter() - start, waited, beyond_size and not waited
+            )
+        record.info["metrics_checked_out_at"] = time.perf_counter()
+        return record
+
+    def _do_return_conn(self, record):
+        start = record.info.pop("metrics_checked_out_at", None)
+        if start is not None:
+            pool_stats[self.stats_key].hold_time.observe(time.perf_counter() - start)
+        super()._do_return_conn(record)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    stats_key = "sync"
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats_key = "async"
+
+
+# ------------------------------------------------------------------------
+# Prometheus registry
+#
+# Counters, gauges and histograms rendered in the Prometheus text format at
+# GET /metrics. With several uvicorn workers each process has its own
+# registry, so when PROMETHEUS_MULTIPROC_DIR is set every process writes a
+# snapshot to <dir>/<pid>.json (every METRICS_FLUSH_SECONDS and at exit)
+# and a scrape merges them: counters and histograms are summed over all
+# files, gauges only over processes that are still alive. Empty the
+# directory when the server (not a single worker) restarts.
+# ------------------------------------------------------------------------
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def value(self) -> float:
+        return self._value
+
+
+class _Family:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        return _Value()
+
+    def collect(self) -> dict:
+        return {key: child.value() for key, child in list(self._children.items())}
+
+
+class Counter(_Family):
+    type = "counter"
+
+
+class Gauge(_Family):
+    type = "gauge"
+
+
+class HistogramFamily(_Family):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def collect(self) -> dict:
+        return {key: child.snapshot() for key, child in list(self._children.items())}
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+        self._collectors = {}
+
+    def _register(self, family):
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily(name, help, labelnames, buckets))
+
+    def set_collector(self, key: str, collect):
+        """
+        Register (or replace) a callable run at scrape time that returns
+        ``(name, type, help, labelnames, {label_values: value})`` tuples, for
+        values that already live elsewhere (pool, hashing and cache stats).
+        """
+        self._collectors[key] = collect
+
+    def collect(self) -> dict:
+        families = {
+            f.name: {"type": f.type, "help": f.help, "labels": f.labelnames, "samples": f.collect()}
+            for f in self._families.values()
+        }
+        for collect in list(self._collectors.values()):
+            for name, type_, help, labelnames, samples in collect():
+                families[name] = {"type": type_, "help": help, "labels": tuple(labelnames), "samples": samples}
+        return families
+
+    # -- multi-process ----------------------------------------------------
+    def write_snapshot(self, directory: str):
+        families = {
+            name: {**family, "samples": [[list(k), v] for k, v in family["samples"].items()]}
+            for name, family in self.collect().items()
+        }
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(families, f)
+        os.replace(tmp, path)
+
+    def collect_all(self, directory: Optional[str] = PROMETHEUS_MULTIPROC_DIR) -> dict:
+        """This process's families merged with the other workers' snapshots."""
+        merged = self.collect()
+        if not directory:
+            return merged
+
+        own = f"{os.getpid()}.json"
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    families = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced, or not one of ours
+            alive = _pid_alive(int(filename[:-5])) if filename[:-5].isdigit() else False
+
+            for name, family in families.items():
+                if family["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**family, "labels": tuple(family["labels"]), "samples": {}})
+                for key, value in family["samples"]:
+                    key = tuple(key)
+                    current = target["samples"].get(key)
+                    target["samples"][key] = value if current is None else _add(current, value)
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        for name, family in sorted(self.collect_all().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family["labels"]
+            for key, value in sorted(family["samples"].items()):
+                labels = list(zip(labelnames, key))
+                if family["type"] == "histogram":
+                    for le, count in value["buckets"].items():
+                        lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def start_flusher(self, directory: Optional[str] = PROMETHEUS_MULTIPROC_DIR):
+        if not directory or getattr(self, "_flusher", None) is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+
+        def flush_forever():
+            while True:
+                time.sleep(METRICS_FLUSH_SECONDS)
+                self.write_snapshot(directory)
+
+        self._flusher = threading.Thread(target=flush_forever, name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.write_snapshot, directory)
+
+
+def _add(a, b):
+    if isinstance(a, dict):
+        return {
+            "buckets": {le: a["buckets"].get(le, 0) + count for le, count in b["buckets"].items()},
+            "sum": a["sum"] + b["sum"],
+            "count": a["count"] + b["count"],
+        }
+    return a + b
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template", ("method", "route")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type", ("operation",)
+)
+calculations = registry.counter("calculations_total", "Calculations computed by op_type", ("op_type",))
+auth_events = registry.counter("auth_events_total", "Authentication outcomes", ("action", "outcome"))
+statement_cache = registry.counter(
+    "db_statement_cache_total", "Compiled SQL statement lookups by outcome (cache_hit, cache_miss, ...)", ("outcome",)
+)
+
+
+# ------------------------------------------------------------------------
+# Collectors for stats owned by other modules
+# ------------------------------------------------------------------------
+def runtime_collector(pools: dict, hash_pool, caches: dict):
+    """Scrape-time families for the connection pools, hashing pool and caches."""
+
+    def collect():
+        for key, pool in pools.items():
+            snap = pool_stats[key].snapshot(pool)
+            labels = ("pool",)
+            yield "db_pool_size", "gauge", "Configured pool size", labels, {(key,): snap["size"]}
+            yield "db_pool_checked_out", "gauge", "Connections in use", labels, {(key,): snap["checked_out"]}
+            yield "db_pool_checked_in", "gauge", "Idle pooled connections", labels, {(key,): snap["checked_in"]}
+            yield "db_pool_checkouts_total", "counter", "Connection checkouts", labels, {(key,): snap["checkouts"]}
+            yield "db_pool_waits_total", "counter", "Checkouts that waited for a connection", labels, {
+                (key,): snap["waits"]
+            }
+            yield "db_pool_overflow_checkouts_total", "counter", "Checkouts served by overflow connections", labels, {
+                (key,): snap["overflow_checkouts"]
+            }
+            yield "db_pool_checkout_seconds", "histogram", "Connection checkout latency", labels, {
+                (key,): snap["checkout_latency_seconds"]
+            }
+            yield "db_pool_connection_hold_seconds", "histogram", "Time a checkout held its connection", labels, {
+                (key,): snap["hold_seconds"]
+            }
+
+        stats = hash_pool.stats()
+        yield "hashing_in_flight", "gauge", "Password hashes running or queued", (), {(): stats["in_flight"]}
+        yield "hashing_queue_depth", "gauge", "Password hashes waiting for a worker", (), {(): stats["queue_depth"]}
+        yield "hashing_completed_total", "counter", "Password hashes completed", (), {(): stats["completed"]}
+        yield "hashing_failed_total", "counter", "Password hashes that raised or were cancelled", (), {
+            (): stats["failed"]
+        }
+        yield "hashing_rejected_total", "counter", "Password hashes rejected as overloaded", (), {
+            (): stats["rejected"]
+        }
+
+        cache_stats = {name: cache.stats() for name, cache in caches.items()}
+        yield "cache_hits_total", "counter", "Cache hits", ("cache",), {
+            (name,): s["hits"] for name, s in cache_stats.items()
+        }
+        yield "cache_misses_total", "counter", "Cache misses", ("cache",), {
+            (name,): s["misses"] for name, s in cache_stats.items()
+        }
+
+    return collect
+
+
+# ------------------------------------------------------------------------
+# Request and query instrumentation
+# ------------------------------------------------------------------------
+class MetricsMiddleware:
+    """Pure ASGI middleware recording http_requests_total and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Unmatched paths share one label so random URLs cannot blow up cardinality
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_requests.labels(scope["method"], route, status).inc()
+            http_request_duration.labels(scope["method"], route).observe(time.perf_counter() - start)
+
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+@sqlhooks.on_statement
+def _record_query(executed):
+    if executed.error is None:
+        operation = executed.statement.lstrip()[:6].upper()
+        db_query_duration.labels(operation if operation in _SQL_OPERATIONS else "OTHER").observe(executed.seconds)
+
+
+@event.listens_for(Engine, "after_execute")
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    # Only compiled constructs go through the cache; driver-level SQL does not
+    context = getattr(result, "context", None)
+    if context is not None and context.compiled is not None:
+        statement_cache.labels(context.cache_hit.name.lower()).inc()
+
+
+def statement_cache_stats(engine) -> dict:
+    """Hit rate of the compiled statement cache (all engines) and ``engine``'s cache fill."""
+    counts = {key[0]: value for key, value in statement_cache.collect().items()}
+    hits, misses = counts.get("cache_hit", 0), counts.get("cache_miss", 0)
+    cache = engine._compiled_cache  # None when query_cache_size=0
+    return {
+        "hits": hits,
+        "misses": misses,
+        "disabled": counts.get("caching_disabled", 0),
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "size": len(cache) if cache is not None else 0,
+        "capacity": cache.capacity if cache is not None else 0,
+    }
+
+
+def install(app):
+    """Record request metrics for ``app`` and, with PROMETHEUS_MULTIPROC_DIR, share them across workers."""
+    app.add_middleware(MetricsMiddleware)
+    registry.start_flusher()
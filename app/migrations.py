@@ -0,0 +1,50 @@
+from sqlalchemy import inspect
+import logging
+
+from . import models
+
+# ------------------------------------------------------------------------
+# Schema upgrades for databases created by an earlier version.
+#
+# create_all only creates missing tables; it never alters an existing one.
+# upgrade() runs on startup on every backend and brings an older schema up
+# to date: it creates the tables added since, adds the listed columns with
+# ALTER TABLE ... ADD COLUMN and creates their indexes. Every step checks
+# the live schema first, so running it again is a no-op.
+# ------------------------------------------------------------------------
+NEW_TABLES = (models.RevokedToken.__table__,)
+NEW_COLUMNS = (models.Calculation.__table__.c.created_at,)
+
+logger = logging.getLogger("app.migrations")
+
+
+def upgrade(connection) -> list:
+    """Upgrade the schema on ``connection`` (run inside a transaction); returns the steps applied."""
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    applied = []
+
+    for table in NEW_TABLES:
+        if table.name not in tables:
+            table.create(connection)
+            applied.append(f"create table {table.name}")
+
+    for column in NEW_COLUMNS:
+        table = column.table
+        if table.name not in tables:
+            continue  # created complete by create_all
+        if column.name not in {c["name"] for c in inspector.get_columns(table.name)}:
+            # Nullable, no server default: rows written before keep NULL
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            )
+            applied.append(f"add column {table.name}.{column.name}")
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if column.name in index.columns and index.name not in existing:
+                index.create(connection)
+                applied.append(f"create index {index.name}")
+
+    for step in applied:
+        logger.warning("schema upgrade: %s", step)
+    return applied
@@ -14,6 +14,8 @@ class Calculation(Base):
 
     # IMPORTANT: Enable FK for ownership
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Indexed for retention deletes (app.retention)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True, index=True)
 
     def compute(self):
         if self.op_type == 'Add':
@@ -36,8 +38,16 @@ class User(Base):
     username = Column(String(50), unique=True, nullable=False, index=True)
     email = Column(String(255), unique=True, nullable=True)
     hashed_password = Column(String(255), nullable=False)
-    token = Column(String(128), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationship: user → list of calculations
     calculations = relationship("Calculation", backref="user")
+
+
+class RevokedToken(Base):
+    """Logged-out access tokens, kept until they would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String(64), unique=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
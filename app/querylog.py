@@ -0,0 +1,187 @@
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+from . import sqlhooks
+
+# ------------------------------------------------------------------------
+# Slow-query log, per-fingerprint statement stats and an N+1 detector.
+#
+# Every statement is reduced to a fingerprint (literals and bind markers
+# replaced by ?, IN lists collapsed) and timed through app.sqlhooks.
+# Statements slower than SLOW_QUERY_MS are logged on "app.querylog". Within
+# a request (QueryLogMiddleware), a fingerprint issued N_PLUS_ONE_THRESHOLD
+# or more times is reported as an N+1 suspect - the pattern of lazy-loading
+# a relationship per row. Everything is summarised at GET /debug/queries,
+# which answers 404 unless QUERYLOG_DEBUG is set: it exposes SQL shapes and
+# routes to anyone who can reach the app.
+# ------------------------------------------------------------------------
+QUERYLOG_DEBUG = os.getenv("QUERYLOG_DEBUG", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Durations kept per fingerprint for the p95
+QUERY_STATS_SAMPLES = int(os.getenv("QUERY_STATS_SAMPLES", "1000"))
+QUERY_STATS_MAX_FINGERPRINTS = int(os.getenv("QUERY_STATS_MAX_FINGERPRINTS", "1000"))
+
+logger = logging.getLogger("app.querylog")
+
+_request_queries: ContextVar[Optional[Counter]] = ContextVar("request_queries", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_BIND = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalise a SQL statement so executions with different values group together."""
+    sql = _STRING.sub("?", statement)
+    sql = _NUMBER.sub("?", sql)
+    sql = _BIND.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _VALUES_LIST.sub(r"\1, ...", sql)
+    return _IN_LIST.sub("(...)", sql)
+
+
+class _FingerprintStats:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=QUERY_STATS_SAMPLES)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)] if ordered else 0.0
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p95_ms": round(p95 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class QueryStats:
+    def __init__(self, max_fingerprints: int = QUERY_STATS_MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self._stats = {}
+        self._n_plus_one = {}
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+
+    def record(self, fp: str, seconds: float):
+        with self._lock:
+            stats = self._stats.get(fp)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    return
+                stats = self._stats[fp] = _FingerprintStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.samples.append(seconds)
+
+    def record_n_plus_one(self, route: str, fp: str, repeats: int):
+        with self._lock:
+            entry = self._n_plus_one.setdefault((route, fp), {"requests": 0, "max_repeats": 0})
+            entry["requests"] += 1
+            entry["max_repeats"] = max(entry["max_repeats"], repeats)
+
+    def snapshot(self, limit: int = 50) -> dict:
+        with self._lock:
+            fingerprints = [{"fingerprint": fp, **s.snapshot()} for fp, s in self._stats.items()]
+            n_plus_one = [
+                {"route": route, "fingerprint": fp, **entry} for (route, fp), entry in self._n_plus_one.items()
+            ]
+        fingerprints.sort(key=lambda f: f["total_ms"], reverse=True)
+        n_plus_one.sort(key=lambda e: e["requests"], reverse=True)
+        return {
+            "slow_query_ms": SLOW_QUERY_MS,
+            "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+            "slow_queries": self.slow_queries,
+            "fingerprints": fingerprints[:limit],
+            "n_plus_one": n_plus_one[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._n_plus_one.clear()
+            self.slow_queries = 0
+
+
+query_stats = QueryStats()
+
+
+# ------------------------------------------------------------------------
+# SQLAlchemy hooks
+# ------------------------------------------------------------------------
+@sqlhooks.on_statement
+def _record_query(executed):
+    if executed.error is not None:
+        return
+    seconds = executed.seconds
+    fp = fingerprint(executed.statement)
+    query_stats.record(fp, seconds)
+
+    counts = _request_queries.get()
+    if counts is not None:
+        counts[fp] += 1
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        query_stats.slow_queries += 1
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(seconds * 1000, 3),
+            "fingerprint": fp,
+            "executemany": executed.executemany,
+        }))
+
+
+# ------------------------------------------------------------------------
+# ASGI middleware: per-request fingerprint counts for the N+1 detector
+# ------------------------------------------------------------------------
+class QueryLogMiddleware:
+    def __init__(self, app, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counts = Counter()
+        token = _request_queries.set(counts)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            # Unmatched paths share one label so random URLs cannot grow the stats
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            for fp, repeats in counts.items():
+                if repeats >= self.threshold:
+                    query_stats.record_n_plus_one(route, fp, repeats)
+                    logger.warning(json.dumps({
+                        "event": "n_plus_one",
+                        "method": scope["method"],
+                        "route": route,
+                        "repeats": repeats,
+                        "fingerprint": fp,
+                    }))
+
+
+def install(app):
+    app.add_middleware(QueryLogMiddleware)
@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from typing import Callable, Optional, Sequence
+import logging
+import os
+import threading
+import time
+
+from . import models
+
+# ------------------------------------------------------------------------
+# Bulk deletes and the retention job.
+#
+# Deletes run as a series of short transactions: select the next
+# ``chunk_size`` matching ids (keyset on id), DELETE ... WHERE id IN (...),
+# commit. Row locks are held for one chunk only, so live writes interleave.
+# The retention job does the same for rows older than RETENTION_DAYS, in
+# small batches with a pause between them.
+# ------------------------------------------------------------------------
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "5000"))
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))  # 0 disables the job
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+RETENTION_PAUSE_SECONDS = float(os.getenv("RETENTION_PAUSE_SECONDS", "0.2"))
+
+logger = logging.getLogger("app.retention")
+
+
+def calculation_filters(
+    ids: Optional[Sequence[int]] = None,
+    min_id: Optional[int] = None,
+    max_id: Optional[int] = None,
+    op_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    older_than: Optional[datetime] = None,
+) -> list:
+    """WHERE clauses for the given filters; id bounds are inclusive."""
+    c = models.Calculation
+    conditions = []
+    if ids is not None:
+        conditions.append(c.id.in_(ids))
+    if min_id is not None:
+        conditions.append(c.id >= min_id)
+    if max_id is not None:
+        conditions.append(c.id <= max_id)
+    if op_type is not None:
+        conditions.append(c.op_type == op_type)
+    if user_id is not None:
+        conditions.append(c.user_id == user_id)
+    if older_than is not None:
+        # Rows created before created_at existed (NULL) are never matched
+        conditions.append(c.created_at < older_than)
+    return conditions
+
+
+def next_chunk_stmt(conditions: list, chunk_size: int, after_id: Optional[int]):
+    stmt = (
+        select(models.Calculation.id)
+        .where(*conditions)
+        .order_by(models.Calculation.id)
+        .limit(chunk_size)
+    )
+    if after_id is not None:
+        stmt = stmt.where(models.Calculation.id > after_id)
+    return stmt
+
+
+def delete_chunk_stmt(ids: list):
+    return (
+        delete(models.Calculation)
+        .where(models.Calculation.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_calculations(
+    db: Session,
+    chunk_size: int = DELETE_CHUNK_SIZE,
+    pause: float = 0.0,
+    on_chunk: Optional[Callable[[list], None]] = None,
+    **filters,
+) -> int:
+    """
+    Delete the calculations matching ``filters`` (see calculation_filters)
+    chunk by chunk, committing after each and sleeping ``pause`` seconds in
+    between. ``on_chunk`` receives each chunk's deleted ids. Returns the
+    number of rows deleted.
+    """
+    conditions = calculation_filters(**filters)
+    if not conditions:
+        raise ValueError("Refusing to delete without a filter")
+
+    deleted, last_id = 0, None
+    while True:
+        ids = db.scalars(next_chunk_stmt(conditions, chunk_size, last_id)).all()
+        if not ids:
+            break
+        db.execute(delete_chunk_stmt(ids))
+        db.commit()
+        deleted += len(ids)
+        last_id = ids[-1]
+        if on_chunk is not None:
+            on_chunk(ids)
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+# ------------------------------------------------------------------------
+# Retention job
+# ------------------------------------------------------------------------
+def purge_expired(
+    db: Session,
+    days: float = RETENTION_DAYS,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    pause: float = RETENTION_PAUSE_SECONDS,
+    on_chunk: Optional[Callable[[list], None]] = None,
+) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return delete_calculations(db, batch_size, pause, on_chunk, older_than=cutoff)
+
+
+class RetentionJob:
+    """Background thread running purge_expired every ``interval`` seconds."""
+
+    def __init__(
+        self,
+        session_factory,
+        days: float = RETENTION_DAYS,
+        interval: float = RETENTION_INTERVAL_SECONDS,
+        on_chunk: Optional[Callable[[list], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.days = days
+        self.interval = interval
+        self.on_chunk = on_chunk
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.days <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            deleted = purge_expired(db, self.days, on_chunk=self.on_chunk)
+        finally:
+            db.close()
+        if deleted:
+            logger.info("retention deleted %d calculations older than %g days", deleted, self.days)
+        return deleted
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("retention run failed")
+            self._stop.wait(self.interval)
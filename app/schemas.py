@@ -29,6 +29,34 @@ class CalculationRead(BaseModel):
 
     model_config = {"from_attributes": True}
 
+class CalculationPage(BaseModel):
+    items: list[CalculationRead]
+    next_cursor: Optional[str] = None
+
+class CalculationBatchError(BaseModel):
+    index: int
+    error: str
+
+class CalculationBatchResult(BaseModel):
+    created: list[CalculationRead]
+    errors: list[CalculationBatchError]
+
+class BadRow(BaseModel):
+    row: int
+    a: Optional[str] = None
+    b: Optional[str] = None
+    op_type: Optional[str] = None
+    error: str
+
+class ImportReport(BaseModel):
+    rows_read: int
+    rows_written: int
+    rows_rejected: int
+    last_committed_row: int = 0  # data rows up to here are committed
+    seconds: float
+    rows_per_sec: float
+    bad_rows: list[BadRow] = []  # the first IMPORT_BAD_ROWS_MAX rejected rows
+
 class UserCreate(BaseModel):
     username: str
     email: Optional[str] = None
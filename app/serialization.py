@@ -0,0 +1,61 @@
+from fastapi.responses import JSONResponse
+from typing import Any, Iterable, Optional
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+# ------------------------------------------------------------------------
+# JSON responses.
+#
+# FastResponse is the default response class of both apps: orjson when it is
+# installed, compact stdlib json otherwise. The *_response helpers below are
+# the fast path for rows read from our own tables: the columns already hold
+# the types CalculationRead declares, so they are turned straight into bytes
+# instead of being validated by response_model and then encoded. A route
+# returning a Response skips FastAPI's response_model step entirely; the
+# response_model stays on the route for the OpenAPI schema.
+# ------------------------------------------------------------------------
+CALCULATION_FIELDS = ("id", "a", "b", "op_type", "result")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def calculation_dict(calc) -> dict:
+    """CalculationRead-shaped dict from a Calculation (ORM object or Row)."""
+    # SQLite's RETURNING hands back whole-number REALs as ints; the schema says float
+    result = calc.result
+    return {
+        "id": calc.id,
+        "a": float(calc.a),
+        "b": float(calc.b),
+        "op_type": calc.op_type,
+        "result": float(result) if result is not None else None,
+    }
+
+
+def calculation_response(calc) -> FastResponse:
+    return FastResponse(calculation_dict(calc))
+
+
+def calculation_page_response(items: Iterable, next_cursor: Optional[str]) -> FastResponse:
+    return FastResponse({"items": [calculation_dict(c) for c in items], "next_cursor": next_cursor})
+
+
+def batch_response(created: list, errors: list) -> FastResponse:
+    # created rows come from prepare_calculations and carry the same keys
+    return FastResponse({
+        "created": [{f: row[f] for f in CALCULATION_FIELDS} for row in created],
+        "errors": errors,
+    })
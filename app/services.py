@@ -0,0 +1,30 @@
+import os
+
+from .auth import RevocationSync
+from .cache import calculation_cache
+from .database import SessionLocal, engine
+from .retention import RetentionJob
+from .sqlite_tuning import SqliteMaintenance
+
+# ------------------------------------------------------------------------
+# Settings and background jobs shared by app.main and app.async_main.
+#
+# Importing this module builds no app. The jobs run on the sync engine in
+# both modes; whichever app is served starts them on startup and stops them
+# on shutdown.
+# ------------------------------------------------------------------------
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50000"))
+
+
+def forget_cached(calc_ids):
+    for calc_id in calc_ids:
+        calculation_cache.delete(calc_id)
+
+
+# Trims calculations older than RETENTION_DAYS; off unless that is set
+retention_job = RetentionJob(SessionLocal, on_chunk=forget_cached)
+# Picks up logouts handled by other workers
+revocation_sync = RevocationSync(SessionLocal)
+# PRAGMA optimize + WAL checkpoints; does nothing on other databases
+sqlite_maintenance = SqliteMaintenance(engine)
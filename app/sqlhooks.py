@@ -0,0 +1,69 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Callable, NamedTuple, Optional
+import time
+
+# ------------------------------------------------------------------------
+# One shared pair of cursor hooks for every statement timer.
+#
+# metrics, querylog, timing and tracing all need each statement's duration.
+# Rather than each registering its own before/after_cursor_execute pair and
+# start stack, they subscribe with @on_statement: the hooks below read the
+# clock once on each side of the cursor call and hand every listener the
+# same ExecutedStatement, also for statements that fail (``error`` set).
+# Hooks are class-level, so they cover every engine, sync or async.
+# ------------------------------------------------------------------------
+_START = "sqlhooks_start"
+
+
+class ExecutedStatement(NamedTuple):
+    statement: str
+    executemany: bool
+    dialect: str
+    seconds: float
+    rowcount: Optional[int]  # None when the driver does not report one
+    error: Optional[BaseException]
+
+
+_listeners: list = []
+
+
+def on_statement(listener: Callable[[ExecutedStatement], None]):
+    """Call ``listener`` with every finished statement; usable as a decorator."""
+    _listeners.append(listener)
+    return listener
+
+
+def _dispatch(executed: ExecutedStatement):
+    for listener in _listeners:
+        listener(executed)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_START)
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    rowcount = getattr(cursor, "rowcount", None)
+    if rowcount is not None and rowcount < 0:
+        rowcount = None
+    _dispatch(ExecutedStatement(statement, executemany, conn.dialect.name, seconds, rowcount, None))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    conn = context.connection
+    starts = conn is not None and conn.info.get(_START)
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    executemany = bool(getattr(context.execution_context, "executemany", False))
+    _dispatch(ExecutedStatement(
+        context.statement or "", executemany, conn.dialect.name, seconds, None, context.original_exception
+    ))
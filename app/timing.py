@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from typing import Optional
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
+
+from . import sqlhooks
+from .database import SessionRoute
+
+# ------------------------------------------------------------------------
+# Per-request timing breakdown.
+#
+# TimingMiddleware opens a RequestTimings for a sampled request; phases are
+# added by TimedRoute (validate / serialize around the endpoint), the
+# SQLAlchemy hooks below (sql, commit, conn = pooled connection hold time)
+# and phase() blocks in the code (compute, hash). The result goes out as a Server-Timing header and one
+# JSON log line on the "app.timing" logger. Unsampled requests only pay for
+# a ContextVar lookup at each hook.
+# ------------------------------------------------------------------------
+TIMING_SAMPLE_RATE = float(os.getenv("TIMING_SAMPLE_RATE", "1.0"))
+TIMING_LOG = os.getenv("TIMING_LOG", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("app.timing")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("start", "phases", "counts", "handler_start", "endpoint_start", "endpoint_end")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.counts = {}
+        self.handler_start = self.endpoint_start = self.endpoint_end = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def header(self, total: float) -> str:
+        parts = []
+        for name, seconds in self.phases.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if name == "sql":
+                part += f';desc="{self.counts[name]} queries"'
+            parts.append(part)
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+# ------------------------------------------------------------------------
+# ASGI middleware
+# ------------------------------------------------------------------------
+class TimingMiddleware:
+    def __init__(self, app, sample_rate: float = TIMING_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = None
+
+        async def send_with_header(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                total = time.perf_counter() - timings.start
+                headers.append((b"server-timing", timings.header(total).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current.reset(token)
+            if TIMING_LOG:
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "total_ms": round((time.perf_counter() - timings.start) * 1000, 3),
+                    **{f"{name}_ms": round(s * 1000, 3) for name, s in timings.phases.items()},
+                    "queries": timings.counts.get("sql", 0),
+                }))
+
+
+# ------------------------------------------------------------------------
+# Route class: validate = request parsing + dependencies, serialize =
+# response_model validation + encoding. SessionRoute releases the request's
+# sessions between the two.
+# ------------------------------------------------------------------------
+def _timed_endpoint(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            timings.endpoint_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_end = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return endpoint(*args, **kwargs)
+            timings.endpoint_start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_end = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(SessionRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _current.get()
+            if timings is None:
+                return await handler(request)
+            handler_start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                if timings.endpoint_start is not None:
+                    timings.add("validate", timings.endpoint_start - handler_start)
+                    timings.add("serialize", time.perf_counter() - timings.endpoint_end)
+
+        return timed_handler
+
+
+def install(app):
+    """Time every route added to ``app`` after this call."""
+    app.router.route_class = TimedRoute
+    app.add_middleware(TimingMiddleware)
+
+
+# ------------------------------------------------------------------------
+# SQLAlchemy hooks (class-level, so they cover every engine and session)
+# ------------------------------------------------------------------------
+@sqlhooks.on_statement
+def _record_query(executed):
+    timings = _current.get()
+    if timings is not None and executed.error is None:
+        timings.add("sql", executed.seconds)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    if _current.get() is not None:
+        session.info["timing_commit_start"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    # Includes the flush that commit() triggers, so it overlaps "sql"
+    timings = _current.get()
+    start = session.info.pop("timing_commit_start", None)
+    if timings is not None and start is not None:
+        timings.add("commit", time.perf_counter() - start)
+
+
+@event.listens_for(Pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    if _current.get() is not None:
+        connection_record.info["timing_checkout"] = time.perf_counter()
+
+
+@event.listens_for(Pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    timings = _current.get()
+    start = connection_record.info.pop("timing_checkout", None)
+    if timings is not None and start is not None:
+        timings.add("conn", time.perf_counter() - start)
@@ -0,0 +1,291 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from . import sqlhooks
+
+# ------------------------------------------------------------------------
+# Distributed-tracing style spans.
+#
+# TracingMiddleware continues the trace named by an incoming W3C
+# ``traceparent`` header (or starts one) and returns the server span's
+# ``traceparent`` on the response. Inside a traced request, spans are opened
+# for every @traced crud call, every SQL statement (app.sqlhooks) and
+# OperationFactory.compute, and handed to the configured exporter as they
+# end. Outside a traced request (CLIs, unsampled requests) span() is a
+# ContextVar lookup and nothing else.
+#
+# TRACING_EXPORTER selects the sink: "none" (default), "memory" or "file"
+# (JSON lines appended to TRACING_FILE). Production sinks plug in with
+# set_exporter().
+# ------------------------------------------------------------------------
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+# Longer statements are cut in the db.statement attribute
+TRACING_MAX_STATEMENT = 2000
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def traceparent(self, sampled: bool = True) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if sampled else '00'}"
+
+    def end(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        if _exporter is not None:
+            _exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def _new_id(bits: int) -> str:
+    # All-zero ids are invalid in W3C trace context
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]):
+    """Return ``(trace_id, parent_id, sampled)`` or None for a missing/invalid header."""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """``traceparent`` for outgoing calls made inside the current span."""
+    span = _current.get()
+    return span.traceparent() if span is not None else None
+
+
+# ------------------------------------------------------------------------
+# Exporters
+# ------------------------------------------------------------------------
+class SpanExporter(ABC):
+    """Sink for finished spans; see set_exporter()."""
+
+    @abstractmethod
+    def export(self, span: Span):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """Append finished spans to ``path`` as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+def build_exporter(kind: str = TRACING_EXPORTER) -> Optional[SpanExporter]:
+    if kind in ("", "none"):
+        return None
+    if kind == "memory":
+        return InMemoryExporter()
+    if kind == "file":
+        return FileExporter(TRACING_FILE)
+    raise ValueError(f"Unknown TRACING_EXPORTER: {kind}")
+
+
+_exporter: Optional[SpanExporter] = build_exporter()
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Install the span sink; None turns tracing off."""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    return _exporter
+
+
+# ------------------------------------------------------------------------
+# Spans inside a request
+# ------------------------------------------------------------------------
+@contextmanager
+def span(name: str, **attributes):
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, **attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        _current.reset(token)
+        child.end(e)
+        raise
+    _current.reset(token)
+    child.end()
+
+
+def traced(fn):
+    """Wrap ``fn`` in a span named ``<module>.<function>``, e.g. ``crud.create_calculation``."""
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+    return wrapper
+
+
+# ------------------------------------------------------------------------
+# ASGI middleware
+# ------------------------------------------------------------------------
+class TracingMiddleware:
+    def __init__(self, app, sample_rate: float = TRACING_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            return await self.app(scope, receive, send)
+
+        incoming = parse_traceparent(_header(scope, b"traceparent"))
+        if incoming is not None:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id, sampled = _new_id(128), None, random.random() < self.sample_rate
+
+        root = Span(f"{scope['method']} {scope['path']}", trace_id, parent_id, **{
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        # Unsampled requests still propagate the trace id, but record nothing
+        token = _current.set(root) if sampled else None
+
+        async def send_with_traceparent(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", root.traceparent(sampled).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_traceparent)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if token is not None:
+                _current.reset(token)
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    root.name = f"{scope['method']} {route}"
+                    root.attributes["http.route"] = route
+                root.end(error)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def install(app):
+    app.add_middleware(TracingMiddleware)
+
+
+# ------------------------------------------------------------------------
+# SQLAlchemy hooks: one span per statement
+# ------------------------------------------------------------------------
+@sqlhooks.on_statement
+def _record_query(executed):
+    parent = _current.get()
+    if parent is None:
+        return
+    query_span = Span(
+        "db.query", parent.trace_id, parent.span_id, **{
+            "db.system": executed.dialect,
+            "db.statement": executed.statement[:TRACING_MAX_STATEMENT],
+            "db.executemany": executed.executemany,
+        }
+    )
+    query_span.start_ns -= int(executed.seconds * 1e9)
+    if executed.rowcount is not None:
+        query_span.attributes["db.rowcount"] = executed.rowcount
+    query_span.end(executed.error)
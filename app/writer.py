@@ -0,0 +1,175 @@
+from concurrent.futures import Future
+from sqlalchemy.orm import Session
+from typing import Callable, Optional
+import asyncio
+import contextvars
+import logging
+import os
+import queue
+import threading
+
+# ------------------------------------------------------------------------
+# Single-writer queue for SQLite.
+#
+# SQLite allows one writer at a time; concurrent commits from the threadpool
+# spin in busy waits and eventually fail with "database is locked". With
+# SQLITE_WRITER enabled, the app hands its writes to one WriteQueue thread
+# instead. The thread takes every write that is waiting (up to
+# SQLITE_WRITER_BATCH), runs each in its own SAVEPOINT inside one
+# BEGIN IMMEDIATE transaction and commits once, so N concurrent writes cost
+# one lock acquisition and one fsync. A failing write rolls back its
+# savepoint only. Reads keep using the pooled sessions concurrently.
+#
+# Writes are ordinary crud functions called as ``fn(db, *args)``: commit()
+# on the session they get marks the end of their savepoint and rollback()
+# undoes it, so the functions need no writer-specific code.
+# ------------------------------------------------------------------------
+SQLITE_WRITER = os.getenv("SQLITE_WRITER", "false").lower() in ("1", "true", "yes")
+SQLITE_WRITER_BATCH = int(os.getenv("SQLITE_WRITER_BATCH", "256"))
+
+logger = logging.getLogger("app.writer")
+
+
+class _Job:
+    __slots__ = ("fn", "args", "context", "future")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        # Run under the caller's context so timing, tracing and the query
+        # log attribute the job's statements to the originating request
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+
+class _JobSession:
+    """The batch session as one job sees it: its transaction is a savepoint."""
+
+    def __init__(self, session: Session):
+        self._session = session
+        self._savepoint = session.begin_nested()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def commit(self):
+        # Releases the savepoint; the batch transaction commits for real
+        if self._savepoint.is_active:
+            self._savepoint.commit()
+
+    def rollback(self):
+        if self._savepoint.is_active:
+            self._savepoint.rollback()
+
+    def finish(self, ok: bool):
+        if ok:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class WriteQueue:
+    def __init__(self, session_factory, max_batch: int = SQLITE_WRITER_BATCH):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue ``fn(db, *args)``; the future resolves once its batch has committed."""
+        if self._thread is None:
+            self.start()
+        job = _Job(fn, args)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn: Callable, *args):
+        """submit() and wait for the result (or the write's exception)."""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        batches = self.batches
+        return {
+            "batches": batches,
+            "writes": self.writes,
+            "mean_batch": self.writes / batches if batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _take_batch(self) -> Optional[list]:
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Finish what was taken, then stop
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch: list):
+        outcomes = []
+        db = self.session_factory()
+        try:
+            # Take the write lock up front; it also keeps pysqlite from
+            # letting the first RELEASE SAVEPOINT commit on its own
+            db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for job in batch:
+                job_db = _JobSession(db)
+                try:
+                    result = job.context.run(job.fn, job_db, *job.args)
+                except Exception as e:
+                    job_db.finish(False)
+                    outcomes.append((job, e))
+                else:
+                    job_db.finish(True)
+                    outcomes.append((job, result))
+            db.commit()
+        except Exception as e:
+            logger.exception("sqlite writer batch of %d writes failed", len(batch))
+            db.rollback()
+            # Nothing in the batch was committed: keep the jobs' own errors,
+            # fail everything else with the batch error
+            errors = {id(job): value for job, value in outcomes if isinstance(value, Exception)}
+            outcomes = [(job, errors.get(id(job), e)) for job in batch]
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.writes += len(batch)
+        for job, value in outcomes:
+            if isinstance(value, Exception):
+                job.future.set_exception(value)
+            else:
+                job.future.set_result(value)
@@ -0,0 +1,79 @@
+"""
+Load benchmark comparing the sync app (app.main, threadpool) with the async
+app (app.async_main, AsyncEngine) in-process over ASGI.
+
+    python -m benchmarks.bench_async_load [--url sqlite+aiosqlite:///./bench.db]
+                                          [--requests 2000] [--concurrency 1 50 500]
+
+--url must name an async driver; the sync app uses the matching sync driver.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bench.db"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 500])
+    return parser.parse_args()
+
+
+async def _run(app, n_requests, concurrency):
+    import httpx
+
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        seed = await client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"})
+        calc_id = seed.json()["id"]
+
+        async def one(i):
+            async with sem:
+                start = time.perf_counter()
+                if i % 2:
+                    resp = await client.get(f"/calculations/{calc_id}")
+                else:
+                    resp = await client.post("/calculations", json={"a": i, "b": 3, "op_type": "Multiply"})
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": n_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def _main(args):
+    from app import async_main, main
+    from app.database import async_engine, engine
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+
+    print(f"{args.requests} requests, 50/50 POST /calculations + GET /calculations/{{id}}")
+    print(f"{'mode':<8}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        for mode, app in (("sync", main.app), ("async", async_main.app)):
+            stats = await _run(app, args.requests, concurrency)
+            print(f"{mode:<8}{concurrency:>6}{stats['rps']:>10.0f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    # Must be set before app modules are imported: they read it at import time
+    os.environ["DATABASE_URL"] = args.url
+    asyncio.run(_main(args))
@@ -0,0 +1,79 @@
+"""
+Read and write throughput of each SQLite profile in app.sqlite_tuning:
+committed single-row inserts (the POST /calculations pattern) and point
+reads by id, from 1 and 8 threads, on a fresh database file per profile.
+
+    python -m benchmarks.bench_sqlite_profile [--writes 1000] [--reads 20000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, sqlite_tuning
+from app.models import Base, Calculation
+from app.schemas import CalculationCreate
+
+
+def _threaded(threads: int, total: int, op) -> float:
+    """Run ``op()`` ``total`` times split across ``threads``; returns ops/s."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(count):
+        barrier.wait()
+        for _ in range(count):
+            op()
+
+    workers = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    return (total // threads * threads) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = CalculationCreate(a=6, b=7, op_type="Multiply")
+    print(f"{'profile':<10}{'write 1t/s':>12}{'write 8t/s':>12}{'read 1t/s':>12}{'read 8t/s':>12}")
+    for profile in sqlite_tuning.PROFILES:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                connect_args={"check_same_thread": False, "timeout": 30},
+                pool_size=8,
+                max_overflow=0,
+            )
+            sqlite_tuning.install(engine, profile, "")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+            def write():
+                with Session() as db:
+                    crud.create_calculation(db, payload)
+
+            def read():
+                with Session() as db:
+                    crud.get_calculation_row(db, random.randint(1, max_id))
+
+            row = [_threaded(1, args.writes, write), _threaded(8, args.writes, write)]
+            with Session() as db:
+                max_id = db.scalar(select(func.max(Calculation.id)))
+            row += [_threaded(1, args.reads, read), _threaded(8, args.reads, read)]
+            print(f"{profile:<10}" + "".join(f"{value:>12,.0f}" for value in row))
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare SQLite write throughput with 1, 8 and 64 concurrent writers: every
+thread committing its own inserts through the pool (the default) against
+all writes funnelled through app.writer.WriteQueue.
+
+    python -m benchmarks.bench_sqlite_writer [--writes 2000] [--writers 1,8,64]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.models import Base
+from app.schemas import CalculationCreate
+from app.writer import WriteQueue
+
+
+def _run(writers: int, writes: int, write):
+    payload = CalculationCreate(a=6, b=7, op_type="Multiply")
+    barrier = threading.Barrier(writers + 1)
+    errors = []
+
+    def worker(count):
+        barrier.wait()
+        for _ in range(count):
+            try:
+                write(payload)
+            except OperationalError as e:  # "database is locked"
+                errors.append(e)
+
+    per_thread = [writes // writers + (i < writes % writers) for i in range(writers)]
+    threads = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--writers", default="1,8,64")
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="sqlite3 timeout in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": args.busy_timeout},
+            pool_size=64,
+            max_overflow=0,
+        )
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+        def direct(payload):
+            with Session() as db:
+                crud.create_calculation(db, payload)
+
+        print(f"{args.writes:,} inserts per run")
+        print(f"{'writers':>8}{'mode':>10}{'writes/s':>12}{'errors':>8}{'mean batch':>12}")
+        for writers in (int(n) for n in args.writers.split(",")):
+            elapsed, errors = _run(writers, args.writes, direct)
+            print(f"{writers:>8}{'direct':>10}{(args.writes - errors) / elapsed:>12,.0f}{errors:>8}{'1.0':>12}")
+
+            queue = WriteQueue(Session)
+            elapsed, errors = _run(writers, args.writes, lambda payload: queue.run(crud.create_calculation, payload))
+            queue.stop()
+            mean = queue.stats()["mean_batch"]
+            print(f"{writers:>8}{'queue':>10}{(args.writes - errors) / elapsed:>12,.0f}{errors:>8}{mean:>12.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
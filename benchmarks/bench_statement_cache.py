@@ -0,0 +1,74 @@
+"""
+Per-call Python overhead of the hot lookups: the legacy Query and per-call
+select() forms they replaced against the module-level statements in
+app.crud, each with the compiled cache on (default size) and off
+(query_cache_size=0).
+
+    python -m benchmarks.bench_statement_cache [--calls 20000]
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.models import Base, Calculation, User
+
+
+def _per_call(fn, calls: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(i % 100 + 1)
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    lookups = {
+        "calculation: db.query().filter()": lambda db: lambda i: (
+            db.query(Calculation).filter(Calculation.id == i).first()
+        ),
+        "calculation: crud.get_calculation": lambda db: lambda i: crud.get_calculation(db, i),
+        "calculation row: select() per call": lambda db: lambda i: db.execute(
+            select(*crud.CALCULATION_COLUMNS).where(Calculation.id == i)
+        ).first(),
+        "calculation row: crud.get_calculation_row": lambda db: lambda i: crud.get_calculation_row(db, i),
+        "user: select() per call": lambda db: lambda i: db.execute(
+            select(*crud.USER_LOGIN_COLUMNS).where(User.username == f"user{i}")
+        ).first(),
+        "user: crud.get_user_by_username": lambda db: lambda i: crud.get_user_by_username(db, f"user{i}"),
+        "current user: db.get(User)": lambda db: lambda i: db.get(User, i),
+        "current user: crud.get_user": lambda db: lambda i: crud.get_user(db, i),
+    }
+
+    results = {}
+    for cache_size in (500, 0):
+        engine = create_engine("sqlite://", query_cache_size=cache_size)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            db.add_all(Calculation(a=i, b=1, op_type="Add", result=i + 1) for i in range(100))
+            db.add_all(User(username=f"user{i}", hashed_password="x") for i in range(1, 101))
+            db.commit()
+        for name, make in lookups.items():
+            with Session() as db:
+                lookup = make(db)
+                # db.get would be served from the identity map after the first call
+                results[name, cache_size] = _per_call(lambda i: (lookup(i), db.expunge_all()), args.calls)
+        engine.dispose()
+
+    print(f"{args.calls:,} calls, best of 3, µs per call")
+    print(f"{'lookup':<44}{'cache on':>10}{'cache off':>11}")
+    for name in lookups:
+        print(f"{name:<44}{results[name, 500]:>10.1f}{results[name, 0]:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
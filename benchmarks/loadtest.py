@@ -0,0 +1,239 @@
+"""
+Load-test every endpoint with a weighted request mix and report throughput
+and p50/p95/p99 latency per route.
+
+In-process (ASGI, database from DATABASE_URL - SQLite or a local Postgres):
+
+    python -m benchmarks.loadtest --requests 5000 --concurrency 32
+
+Over HTTP against a running server:
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000
+
+Baselines:
+
+    python -m benchmarks.loadtest --save baseline.json
+    python -m benchmarks.loadtest --compare baseline.json --threshold 0.2
+
+--compare exits with status 1 when any route's p95 grows, or its
+throughput drops, by more than --threshold (a fraction) versus the baseline.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+import uuid
+
+DEFAULT_MIX = "create=40,read=30,list=15,batch=5,login=8,register=2"
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown route {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ------------------------------------------------------------------------
+# Scenarios: one request each, returning the response
+# ------------------------------------------------------------------------
+_counter = itertools.count()
+
+
+async def _create(client, state):
+    return await client.post("/calculations", json={"a": next(_counter), "b": 3, "op_type": "Multiply"})
+
+
+async def _read(client, state):
+    return await client.get(f"/calculations/{state['calc_id']}")
+
+
+async def _list(client, state):
+    return await client.get("/calculations", params={"limit": 50})
+
+
+async def _batch(client, state):
+    items = [{"a": i, "b": 2, "op_type": "Add"} for i in range(100)]
+    return await client.post("/calculations/batch", json=items)
+
+
+async def _login(client, state):
+    return await client.post("/users/login", json=state["credentials"])
+
+
+async def _register(client, state):
+    return await client.post(
+        "/users/register", json={"username": f"load-{uuid.uuid4().hex[:12]}", "password": "load-test"}
+    )
+
+
+SCENARIOS = {
+    "create": ("POST /calculations", _create),
+    "read": ("GET /calculations/{id}", _read),
+    "list": ("GET /calculations", _list),
+    "batch": ("POST /calculations/batch", _batch),
+    "login": ("POST /users/login", _login),
+    "register": ("POST /users/register", _register),
+}
+
+
+async def _setup(client):
+    credentials = {"username": f"load-{uuid.uuid4().hex[:12]}", "password": "load-test"}
+    (await client.post("/users/register", json=credentials)).raise_for_status()
+    resp = await client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"})
+    resp.raise_for_status()
+    return {"credentials": credentials, "calc_id": resp.json()["id"]}
+
+
+async def run(client, mix, n_requests, concurrency, seed=0):
+    state = await _setup(client)
+    names = list(mix)
+    # Fixed seed so every run replays the same request sequence
+    plan = random.Random(seed).choices(names, weights=[mix[n] for n in names], k=n_requests)
+
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    queue = iter(plan)
+
+    async def worker():
+        for name in queue:
+            start = time.perf_counter()
+            try:
+                resp = await SCENARIOS[name][1](client, state)
+                ok = resp.status_code < 400
+            except Exception:
+                ok = False
+            latencies[name].append(time.perf_counter() - start)
+            errors[name] += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for name in names:
+        values = sorted(latencies[name])
+        routes[SCENARIOS[name][0]] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return {"elapsed_s": elapsed, "rps": n_requests / elapsed, "routes": routes}
+
+
+def compare(result, baseline, threshold):
+    """Return a list of human-readable regressions of ``result`` versus ``baseline``."""
+    regressions = []
+    for route, base in baseline["routes"].items():
+        current = result["routes"].get(route)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {base['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{route}: throughput {base['rps']:.0f} -> {current['rps']:.0f} req/s")
+    return regressions
+
+
+def print_report(result):
+    print(f"{result['rps']:.0f} req/s overall in {result['elapsed_s']:.2f}s")
+    print(f"{'route':<28}{'reqs':>7}{'errs':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, r in result["routes"].items():
+        print(f"{route:<28}{r['requests']:>7}{r['errors']:>6}{r['rps']:>9.0f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}")
+
+
+async def _main(args):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        target = args.base_url
+        async with client:
+            result = await run(client, mix, args.requests, args.concurrency, args.seed)
+    else:
+        from app.database import ASYNC_MODE, DATABASE_URL, async_engine, engine
+        from app.hashing import hash_pool
+        from app.models import Base
+
+        if ASYNC_MODE:
+            from app.async_main import app
+        else:
+            from app.main import app
+        # ASGITransport does not run startup events
+        Base.metadata.create_all(bind=engine)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest")
+        target = f"in-process ({DATABASE_URL})"
+        try:
+            async with client:
+                result = await run(client, mix, args.requests, args.concurrency, args.seed)
+        finally:
+            hash_pool.shutdown()
+            if ASYNC_MODE:
+                await async_engine.dispose()
+
+    result["meta"] = {
+        "target": target,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    print(f"{target}: {args.requests} requests, concurrency {args.concurrency}")
+    print_report(result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} versus {args.compare}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0], formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n", 2)[2],
+    )
+    parser.add_argument("--base-url", help="drive a running server over HTTP instead of in-process")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route=weight list (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the result as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
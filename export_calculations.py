@@ -0,0 +1,40 @@
+# stream calculations out as CSV/NDJSON/Arrow: `python export_calculations.py -o out.csv.gz --compression gzip`
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.exporter import COMPRESSIONS, EXPORT_CHUNK_SIZE, FORMATS, export_calculations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export calculations")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--compression", choices=list(COMPRESSIONS))
+    parser.add_argument("--op-type")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--min-id", type=int)
+    parser.add_argument("--max-id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="default: stdout")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        stream = export_calculations(
+            db, args.format, args.compression,
+            op_type=args.op_type, user_id=args.user_id,
+            min_id=args.min_id, max_id=args.max_id, chunk_size=args.chunk_size,
+        )
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for data in stream:
+                out.write(data)
+        finally:
+            if args.output:
+                out.close()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# bulk-load calculations from CSV or Parquet: `python import_calculations.py data.csv`
+import argparse
+import json
+import os
+import sys
+
+from app.database import SessionLocal
+from app.importer import IMPORT_CHUNK_SIZE, ImportFailed, import_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import calculations (columns: a, b, op_type)")
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--bad-rows", default="bad_rows.csv", help="where rejected rows are written")
+    parser.add_argument("--user-id", type=int, help="owner for every imported row")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.path.endswith((".parquet", ".pq")) else "csv")
+
+    def progress(report):
+        print(f"{report['rows_read']:>12,} read  {report['rows_per_sec']:>10,.0f} rows/s", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as fileobj, open(args.bad_rows, "w", newline="") as bad_rows:
+            report = import_file(
+                db, fileobj, fmt, args.chunk_size,
+                bad_rows=bad_rows, user_id=args.user_id, progress=progress,
+            )
+    except ImportFailed as e:
+        # Rows up to last_committed_row are in the database; don't re-import them
+        print(json.dumps({"error": str(e), **e.report}, indent=2))
+        sys.exit(1)
+    finally:
+        db.close()
+
+    if report["rows_rejected"]:
+        report["bad_rows_path"] = args.bad_rows
+    else:
+        os.remove(args.bad_rows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
 # helper to run the app locally with `python main.py`
 import uvicorn
+from app.database import ASYNC_MODE
+
 if __name__ == '__main__':
-    uvicorn.run('app.main:app', host='0.0.0.0', port=8000, reload=True)
+    # An async driver in DATABASE_URL (e.g. sqlite+aiosqlite://) serves the async app
+    target = 'app.async_main:app' if ASYNC_MODE else 'app.main:app'
+    uvicorn.run(target, host='0.0.0.0', port=8000, reload=True)
@@ -0,0 +1,44 @@
+# delete calculations in small batches, e.g. from cron: `python purge_calculations.py --older-than-days 90`
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.retention import RETENTION_BATCH_SIZE, RETENTION_PAUSE_SECONDS, delete_calculations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete calculations matching all given filters")
+    parser.add_argument("--older-than-days", type=float)
+    parser.add_argument("--op-type")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--min-id", type=int)
+    parser.add_argument("--max-id", type=int)
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=RETENTION_PAUSE_SECONDS, help="seconds between batches")
+    args = parser.parse_args(argv)
+
+    older_than = None
+    if args.older_than_days is not None:
+        older_than = datetime.utcnow() - timedelta(days=args.older_than_days)
+
+    def progress(ids):
+        print(f"deleted ids {ids[0]}..{ids[-1]}", file=sys.stderr)
+
+    db = SessionLocal()
+    try:
+        deleted = delete_calculations(
+            db, args.batch_size, args.pause, progress,
+            op_type=args.op_type, user_id=args.user_id,
+            min_id=args.min_id, max_id=args.max_id, older_than=older_than,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        db.close()
+    print(json.dumps({"deleted": deleted}))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from app import sqlite_tuning
 from app.main import app, get_db
 from app.models import Base
 
@@ -20,8 +21,10 @@ engine = create_engine(
     connect_args=connect_args,
     pool_pre_ping=True,
 )
+# Same PRAGMA profile as the app's engine
+sqlite_tuning.install(engine)
 
-SessionTesting = sessionmaker(bind=engine)
+SessionTesting = sessionmaker(bind=engine, expire_on_commit=False)
 
 # ⭐ ALWAYS DROP + CREATE TABLES for TEST DATABASE (sqlite OR postgres)
 Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,84 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+pytest.importorskip("aiosqlite")
+
+from app.async_main import app
+from app.database import get_async_db
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+
+pytestmark = pytest.mark.skipif(
+    not DATABASE_URL.startswith("sqlite"), reason="async tests run against the SQLite test database"
+)
+
+
+@pytest.fixture(scope="function")
+def async_client():
+    # NullPool: TestClient runs each test on a fresh event loop
+    engine = create_async_engine(DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool)
+    SessionTesting = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with SessionTesting() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # No `with`: the tables already exist and startup would use the app's own engine
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_async_db, None)
+
+
+def test_async_calculation_bread(async_client):
+    resp = async_client.post("/calculations", json={"a": 9, "b": 3, "op_type": "Divide"})
+    assert resp.status_code == 200
+    calc_id = resp.json()["id"]
+
+    assert async_client.get(f"/calculations/{calc_id}").json()["result"] == 3.0
+
+    resp = async_client.put(f"/calculations/{calc_id}", json={"a": 2, "b": 5, "op_type": "Multiply"})
+    assert resp.json()["result"] == 10
+
+    async_client.post("/calculations", json={"a": 1, "b": 1, "op_type": "Sub"})
+    page = async_client.get("/calculations", params={"limit": 1}).json()
+    assert len(page["items"]) == 1 and page["next_cursor"]
+    lines = async_client.get("/calculations", params={"format": "ndjson"}).text.splitlines()
+    assert any(f'"id":{calc_id},' in line for line in lines)
+
+    assert async_client.delete(f"/calculations/{calc_id}").json() == {"deleted": calc_id}
+    assert async_client.get(f"/calculations/{calc_id}").status_code == 404
+
+
+def test_async_ndjson_lines_match_json_page_items(async_client):
+    async_client.post("/calculations", json={"a": 3, "b": 4, "op_type": "Add"})
+    items = async_client.get("/calculations", params={"limit": 1000}).json()["items"]
+    lines = async_client.get("/calculations", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line) for line in lines][:len(items)] == items
+
+
+def test_async_register_login_me(async_client):
+    assert async_client.post("/users/register", json={"username": "asyncu", "password": "pw"}).status_code == 200
+    token = async_client.post("/users/login", json={"username": "asyncu", "password": "pw"}).json()["token"]
+    resp = async_client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert resp.json()["username"] == "asyncu"
+
+
+def test_async_export_and_writer_routes(async_client):
+    calc_id = async_client.post("/calculations", json={"a": 5, "b": 5, "op_type": "Add"}).json()["id"]
+    resp = async_client.get("/calculations/export", params={"format": "ndjson", "min_id": calc_id})
+    assert resp.status_code == 200
+    assert resp.headers["content-disposition"] == 'attachment; filename="calculations.ndjson"'
+    assert f'"id":{calc_id},' in resp.text
+    assert async_client.get("/metrics/writer").json() == {"enabled": False}
+
+
+def test_async_app_does_not_build_the_sync_app():
+    import subprocess
+    import sys
+
+    code = "import sys, app.async_main; sys.exit('app.main' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
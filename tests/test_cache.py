@@ -0,0 +1,108 @@
+import fnmatch
+from app.cache import LRUCache, RedisCache, calculation_cache, result_cache
+from app.factory import OperationFactory
+
+
+class FakeRedis:
+    """Local stand-in for the redis-py client calls RedisCache makes."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        assert ex is None or ex >= 1  # redis rejects ex=0
+        self.data[name] = value.encode()
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+    def incr(self, name):
+        self.data[name] = str(int(self.data.get(name, 0)) + 1).encode()
+
+    def expire(self, name, seconds):
+        pass
+
+    def scan_iter(self, match):
+        return [k for k in list(self.data) if fnmatch.fnmatch(k, match)]
+
+
+def test_lru_cache_evicts_oldest_and_expires():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    cache.set('d', 4, ttl=-1)
+    assert cache.get('d') is None
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 2
+
+
+def test_redis_cache_round_trips_and_clears():
+    cache = RedisCache(FakeRedis(), prefix="result:")
+    cache.set(("Add", 1.0, 2.0), 3.0)
+    assert cache.get(("Add", 1.0, 2.0)) == 3.0
+    assert cache.get(("Add", 2.0, 2.0)) is None
+    cache.clear()
+    assert cache.get(("Add", 1.0, 2.0)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_redis_cache_rounds_sub_second_ttls_up():
+    cache = RedisCache(FakeRedis(), prefix="result:", ttl=0.5)
+    cache.set("k", 1)
+    assert cache.get("k") == 1
+
+
+def test_set_if_unchanged_loses_to_a_racing_delete():
+    for cache in (LRUCache(maxsize=2), RedisCache(FakeRedis(), prefix="calculation:")):
+        version = cache.version(1)
+        assert cache.set_if_unchanged(1, {"result": 1}, version) and cache.get(1) == {"result": 1}
+
+        version = cache.version(1)
+        cache.delete(1)  # a PUT commits between the read and the set
+        assert not cache.set_if_unchanged(1, {"result": 1}, version)
+        assert cache.get(1) is None
+
+
+def test_factory_compute_consults_result_cache():
+    result_cache.clear()
+    before = result_cache.stats()["hits"]
+    assert OperationFactory.compute('Multiply', 6, 7) == 42
+    assert OperationFactory.compute('Multiply', 6, 7) == 42
+    assert result_cache.stats()["hits"] == before + 1
+
+
+def test_put_and_delete_invalidate_calculation_cache(client):
+    calc_id = client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"}).json()["id"]
+    assert client.get(f"/calculations/{calc_id}").json()["result"] == 3
+    assert calculation_cache.get(calc_id)["result"] == 3
+
+    resp = client.put(f"/calculations/{calc_id}", json={"a": 5, "b": 2, "op_type": "Sub"})
+    assert resp.status_code == 200 and resp.json()["result"] == 3
+    assert calculation_cache.get(calc_id) is None
+    assert client.get(f"/calculations/{calc_id}").json()["op_type"] == "Sub"
+
+    client.delete(f"/calculations/{calc_id}")
+    assert client.get(f"/calculations/{calc_id}").status_code == 404
+
+
+def test_read_racing_an_update_does_not_cache_the_stale_row(client, monkeypatch):
+    from app import main
+
+    calc_id = client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"}).json()["id"]
+    read_row = main.get_calculation_row
+
+    def read_then_update(db, cid):
+        row = read_row(db, cid)
+        calculation_cache.delete(cid)  # the PUT's invalidation lands before our set
+        return row
+
+    monkeypatch.setattr(main, "get_calculation_row", read_then_update)
+    assert client.get(f"/calculations/{calc_id}").json()["result"] == 3
+    assert calculation_cache.get(calc_id) is None
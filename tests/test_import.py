@@ -0,0 +1,79 @@
+import io
+import pytest
+
+
+CSV = "a,b,op_type\n1,2,Add\n6,3,Divide\n1,0,Divide\nx,1,Sub\n4,4,Multiply\n"
+
+
+def test_csv_import_endpoint_writes_rows_and_reports_bad_rows(client):
+    before = len(client.get("/calculations", params={"format": "ndjson"}).text.splitlines())
+
+    resp = client.post("/calculations/import", content=CSV, headers={"content-type": "text/csv"})
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["rows_read"] == 5
+    assert report["rows_written"] == 3
+    assert report["rows_rejected"] == 2
+
+    assert [bad["row"] for bad in report["bad_rows"]] == [3, 4]
+    assert report["bad_rows"][0] == {"row": 3, "a": "1", "b": "0", "op_type": "Divide", "error": "Division by zero is not allowed."}
+
+    lines = client.get("/calculations", params={"format": "ndjson"}).text.splitlines()
+    assert len(lines) == before + 3
+    assert '"result":16.0' in lines[-1]
+
+
+def test_import_endpoint_caps_bad_rows(client, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "IMPORT_BAD_ROWS_MAX", 2)
+    resp = client.post("/calculations/import", content="a,b,op_type\n" + "x,1,Add\n" * 5)
+    assert resp.json()["rows_rejected"] == 5
+    assert [bad["row"] for bad in resp.json()["bad_rows"]] == [1, 2]
+
+
+@pytest.mark.parametrize("fmt, body", [
+    ("csv", b"a,b,op_type\n1,2,Add\n\xff\xfe,1,Add\n"),
+    ("parquet", b"not a parquet file"),
+])
+def test_import_endpoint_rejects_unreadable_files(client, fmt, body):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    resp = client.post("/calculations/import", params={"format": fmt}, content=body)
+    assert resp.status_code == 400
+
+
+def test_import_failing_after_the_first_chunk_reports_committed_rows(client, monkeypatch):
+    import functools
+    from app import main
+
+    monkeypatch.setattr(main, "import_file", functools.partial(main.import_file, chunk_size=1000))
+    before = len(client.get("/calculations", params={"format": "ndjson"}).text.splitlines())
+    # 24 KB of good rows, then bytes that are not UTF-8
+    body = b"a,b,op_type\n" + b"1,2,Add\n" * 3000 + b"\xff\xfe,1,Add\n"
+
+    resp = client.post("/calculations/import", content=body)
+    assert resp.status_code == 400
+    detail = resp.json()["detail"]
+    assert "utf-8" in detail["error"]
+    report = detail["report"]
+    assert report["rows_written"] == report["last_committed_row"] > 0
+    assert report["last_committed_row"] % 1000 == 0
+    after = len(client.get("/calculations", params={"format": "ndjson"}).text.splitlines())
+    assert after - before == report["rows_written"]
+
+
+def test_parquet_import(db_session):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from app.importer import import_file
+
+    table = pa.table({"a": [1.0, 2.0, 3.0], "b": [1.0, 2.0, 0.0], "op_type": ["Add", "Sub", "Divide"]})
+    buf = io.BytesIO()
+    pq.write_table(table, buf)
+    buf.seek(0)
+
+    bad_rows = io.StringIO()
+    report = import_file(db_session, buf, "parquet", chunk_size=2, bad_rows=bad_rows)
+    assert (report["rows_read"], report["rows_written"], report["rows_rejected"]) == (3, 2, 1)
+    assert "Division by zero" in bad_rows.getvalue()
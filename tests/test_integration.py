@@ -1,6 +1,17 @@
+import json
 import os
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from app.schemas import CalculationCreate, OpType
-from app.crud import create_calculation, get_calculation
+from app.crud import (
+    create_calculation,
+    get_calculation,
+    get_calculation_row,
+    list_calculations,
+    update_calculation,
+)
 
 def test_create_and_read_calculation(db_session):
     payload = CalculationCreate(a=10, b=5, op_type=OpType.Divide)
@@ -9,9 +20,147 @@ def test_create_and_read_calculation(db_session):
     fetched = get_calculation(db_session, calc.id)
     assert fetched.result == 2.0
 
+def test_read_paths_return_rows_without_orm_instances(db_session):
+    calc = create_calculation(db_session, CalculationCreate(a=3, b=4, op_type=OpType.Add))
+    db_session.expunge_all()
+
+    row = get_calculation_row(db_session, calc.id)
+    assert (row.id, row.op_type, row.result) == (calc.id, "Add", 7.0)
+    rows, _ = list_calculations(db_session, limit=5)
+    assert rows and rows[0]._fields == ("id", "a", "b", "op_type", "result")
+    assert len(db_session.identity_map) == 0
+
 def test_post_endpoint(client):
     # Using FastAPI TestClient, test the POST endpoint
     resp = client.post("/calculations", json={"a": 4, "b": 2, "op_type": "Divide"})
     assert resp.status_code == 200
     data = resp.json()
     assert data["result"] == 2.0
+
+@contextmanager
+def count_statements():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+
+def test_writes_are_single_statements(client, db_session):
+    if not db_session.get_bind().dialect.update_returning:
+        pytest.skip("database has no RETURNING")
+    with count_statements() as statements:
+        calc_id = client.post("/calculations", json={"a": 2, "b": 3, "op_type": "Add"}).json()["id"]
+    assert len(statements) == 1 and "RETURNING" in statements[0]
+
+    with count_statements() as statements:
+        resp = client.put(f"/calculations/{calc_id}", json={"a": 2, "b": 3, "op_type": "Multiply"})
+    assert resp.json()["result"] == 6.0
+    assert len(statements) == 1 and statements[0].startswith("UPDATE")
+
+    with count_statements() as statements:
+        assert client.delete(f"/calculations/{calc_id}").json() == {"deleted": calc_id}
+    assert len(statements) == 1
+    assert client.put(f"/calculations/{calc_id}", json={"a": 1, "b": 1, "op_type": "Add"}).status_code == 404
+    assert client.delete(f"/calculations/{calc_id}").status_code == 404
+
+def test_writes_without_returning_fall_back_to_select(db_session, monkeypatch):
+    dialect = db_session.get_bind().dialect
+    monkeypatch.setattr(dialect, "insert_returning", False)
+    monkeypatch.setattr(dialect, "update_returning", False)
+
+    calc = create_calculation(db_session, CalculationCreate(a=9, b=3, op_type=OpType.Divide))
+    assert (calc.op_type, calc.result) == ("Divide", 3.0)
+    updated = update_calculation(db_session, calc.id, CalculationCreate(a=9, b=3, op_type=OpType.Sub))
+    assert (updated.id, updated.result) == (calc.id, 6.0)
+    assert update_calculation(db_session, -1, CalculationCreate(a=1, b=1, op_type=OpType.Add)) is None
+
+def test_browse_calculations_keyset_pages(client):
+    ids = [
+        client.post("/calculations", json={"a": i, "b": 1, "op_type": "Add"}).json()["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["after"] = cursor
+        resp = client.get("/calculations", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert set(ids) <= set(seen)
+
+def test_browse_calculations_ndjson_stream(client):
+    client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Multiply"})
+    resp = client.get("/calculations", params={"format": "ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [line for line in resp.text.splitlines() if line]
+    assert lines and all("op_type" in line for line in lines)
+
+def test_browse_ndjson_lines_match_json_page_items(client):
+    client.post("/calculations", json={"a": 3, "b": 4, "op_type": "Add"})
+    items = client.get("/calculations", params={"limit": 1000}).json()["items"]
+    lines = client.get("/calculations", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line) for line in lines][:len(items)] == items
+
+def test_browse_calculations_bad_cursor(client):
+    resp = client.get("/calculations", params={"after": "not-a-cursor"})
+    assert resp.status_code == 400
+
+def test_batch_insert_is_one_statement_per_page(client, db_session):
+    items = [{"a": i, "b": 2, "op_type": "Multiply"} for i in range(50)]
+    with count_statements() as statements:
+        created = client.post("/calculations/batch", json=items).json()["created"]
+    inserts = [s for s in statements if s.startswith("INSERT")]
+    assert len(inserts) == 1 and len(statements) <= 2
+    for calc in (created[0], created[-1]):
+        assert client.get(f"/calculations/{calc['id']}").json()["a"] == calc["a"]
+
+def test_batch_endpoint_reports_bad_items(client):
+    resp = client.post("/calculations/batch", json=[
+        {"a": 1, "b": 2, "op_type": "Add"},
+        {"a": 1, "b": 0, "op_type": "Divide"},
+        {"a": 3, "b": 4, "op_type": "Multiply"},
+        {"a": "x", "b": 1, "op_type": "Sub"},
+    ])
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [c["result"] for c in data["created"]] == [3, 12]
+    assert [e["index"] for e in data["errors"]] == [1, 3]
+
+    fetched = client.get(f"/calculations/{data['created'][1]['id']}")
+    assert fetched.json()["op_type"] == "Multiply"
+
+def test_export_csv_gzip_with_filters(client):
+    import csv, gzip, io
+    ids = [
+        client.post("/calculations", json={"a": i, "b": 2, "op_type": op}).json()["id"]
+        for i, op in enumerate(["Add", "Sub", "Add"])
+    ]
+    resp = client.get("/calculations/export", params={
+        "format": "csv", "compression": "gzip", "op_type": "Add", "min_id": ids[0], "max_id": ids[-1],
+    })
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/gzip"
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(resp.content).decode())))
+    assert [int(r["id"]) for r in rows] == [ids[0], ids[2]]
+    assert rows[1]["result"] == "4.0"
+
+def test_export_arrow_stream(client):
+    import pytest
+    pa = pytest.importorskip("pyarrow")
+    calc_id = client.post("/calculations", json={"a": 3, "b": 3, "op_type": "Multiply"}).json()["id"]
+    resp = client.get("/calculations/export", params={"format": "arrow", "min_id": calc_id})
+    table = pa.ipc.open_stream(resp.content).read_all()
+    assert table.column("result").to_pylist() == [9.0]
@@ -0,0 +1,22 @@
+from benchmarks.loadtest import compare, percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    baseline = {"routes": {
+        "GET /calculations": {"p95_ms": 10.0, "rps": 100.0},
+        "POST /calculations": {"p95_ms": 10.0, "rps": 100.0},
+    }}
+    result = {"routes": {
+        "GET /calculations": {"p95_ms": 11.0, "rps": 95.0},
+        "POST /calculations": {"p95_ms": 15.0, "rps": 70.0},
+    }}
+    regressions = compare(result, baseline, threshold=0.2)
+    assert len(regressions) == 2
+    assert all(r.startswith("POST /calculations") for r in regressions)
@@ -0,0 +1,88 @@
+import os
+
+from app.database import engine
+from app.metrics import Histogram, Registry, pool_stats
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+    snap = h.snapshot()
+    assert snap["buckets"] == {"0.1": 1, "1.0": 3, "+Inf": 4}
+    assert snap["count"] == 4 and abs(snap["sum"] - 4.25) < 1e-9
+
+
+def test_pool_metrics_track_checkouts(client):
+    before = pool_stats["sync"].checkouts
+    with engine.connect():
+        pass
+    data = client.get("/metrics/pool").json()["sync"]
+    assert data["checkouts"] == before + 1
+    assert data["checkout_latency_seconds"]["count"] >= 1
+    assert data["hold_seconds"]["count"] >= 1
+    assert data["checked_out"] == 0
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_prometheus_endpoint(client):
+    before = client.get("/metrics").text
+    client.post("/calculations", json={"a": 2, "b": 5, "op_type": "Multiply"})
+    client.get("/users/me")
+
+    resp = client.get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+
+    route = 'http_requests_total{method="POST",route="/calculations",status="200"}'
+    assert _sample(text, route) == _sample(before, route) + 1
+    calcs = 'calculations_total{op_type="Multiply"}'
+    assert _sample(text, calcs) == _sample(before, calcs) + 1
+    missing = 'auth_events_total{action="token",outcome="missing"}'
+    assert _sample(text, missing) == _sample(before, missing) + 1
+    assert _sample(text, 'db_query_duration_seconds_count{operation="INSERT"}') >= 1
+    assert 'db_pool_checked_out{pool="sync"}' in text
+    assert 'db_pool_connection_hold_seconds_count{pool="sync"}' in text
+
+
+def test_registry_merges_worker_snapshots(tmp_path):
+    worker = Registry()
+    requests = worker.counter("requests_total", "Requests", ("route",))
+    in_flight = worker.gauge("in_flight", "In flight")
+    latency = worker.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.labels("/a").inc(3)
+    in_flight.labels().set(2)
+    latency.labels().observe(0.5)
+    worker.write_snapshot(tmp_path)
+    # Pretend the snapshot came from another, already exited worker
+    (tmp_path / f"{os.getpid()}.json").rename(tmp_path / "999999999.json")
+
+    scraper = Registry()
+    scraper.counter("requests_total", "Requests", ("route",)).labels("/a").inc(2)
+    scraper.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).labels().observe(0.05)
+
+    merged = scraper.collect_all(str(tmp_path))
+    assert merged["requests_total"]["samples"][("/a",)] == 5
+    assert merged["latency_seconds"]["samples"][()]["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 2}
+    # Gauges from dead processes are dropped, counters are kept
+    assert "in_flight" not in merged
+
+
+def test_statement_cache_hits_for_repeated_lookups(client):
+    created = client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"}).json()
+    client.get(f"/calculations/{created['id'] + 1000}")
+    before = client.get("/metrics/statement-cache").json()
+    for offset in range(1001, 1006):
+        client.get(f"/calculations/{created['id'] + offset}")
+    after = client.get("/metrics/statement-cache").json()
+    assert after["hits"] >= before["hits"] + 5
+    assert after["misses"] == before["misses"]
+    assert 0 < after["hit_rate"] <= 1
+    assert 'db_statement_cache_total{outcome="cache_hit"}' in client.get("/metrics").text
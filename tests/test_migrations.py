@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app import main
+from app.migrations import upgrade
+
+# Schema as created by the version before created_at and revoked_tokens
+PRE_SERIES_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, username VARCHAR(50) NOT NULL, email VARCHAR(255),
+    hashed_password VARCHAR(255) NOT NULL, token VARCHAR(128), created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (email)
+);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE TABLE calculations (
+    id INTEGER NOT NULL, a FLOAT NOT NULL, b FLOAT NOT NULL, op_type VARCHAR(20) NOT NULL,
+    result FLOAT, user_id INTEGER, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_calculations_id ON calculations (id);
+INSERT INTO calculations (a, b, op_type, result) VALUES (1, 2, 'Add', 3);
+"""
+
+
+def test_app_boots_and_writes_on_a_pre_series_schema(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}", connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.connection.executescript(PRE_SERIES_SCHEMA)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def old_db():
+        with Session() as db:
+            yield db
+
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_db, old_db)
+    with TestClient(main.app) as client:
+        assert client.post("/calculations", json={"a": 2, "b": 3, "op_type": "Add"}).status_code == 200
+        batch = client.post("/calculations/batch", json=[{"a": 1, "b": 1, "op_type": "Sub"}])
+        assert batch.status_code == 200 and len(batch.json()["created"]) == 1
+        assert client.get("/calculations/1").json()["result"] == 3
+
+    schema = inspect(engine)
+    assert "created_at" in {c["name"] for c in schema.get_columns("calculations")}
+    assert "ix_calculations_created_at" in {i["name"] for i in schema.get_indexes("calculations")}
+    assert "revoked_tokens" in schema.get_table_names()
+    with engine.begin() as conn:
+        assert upgrade(conn) == []
+    engine.dispose()
@@ -0,0 +1,79 @@
+import json
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import querylog
+from app.database import SessionLocal
+from app.models import Calculation
+from app.querylog import fingerprint, query_stats
+
+
+def test_fingerprint_normalises_values():
+    assert fingerprint("SELECT * FROM t WHERE name = 'o''brien' AND id IN (1, 2, 3)") == (
+        "SELECT * FROM t WHERE name = ? AND id IN (...)"
+    )
+    assert fingerprint("SELECT a FROM t\n WHERE id = %(id_1)s LIMIT :n") == "SELECT a FROM t WHERE id = ? LIMIT ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == (
+        "INSERT INTO t (a, b) VALUES (...), ..."
+    )
+
+
+def test_n_plus_one_is_detected(caplog):
+    app = FastAPI()
+    querylog.install(app)
+
+    @app.get("/lazy")
+    def lazy():
+        with SessionLocal() as db:
+            for calc_id in range(querylog.N_PLUS_ONE_THRESHOLD):
+                db.execute(select(Calculation.result).where(Calculation.id == calc_id)).first()
+
+    query_stats.reset()
+    with caplog.at_level(logging.WARNING, logger="app.querylog"):
+        TestClient(app).get("/lazy")
+
+    report = query_stats.snapshot()
+    suspect = report["n_plus_one"][0]
+    assert suspect["route"] == "/lazy"
+    assert suspect["max_repeats"] == querylog.N_PLUS_ONE_THRESHOLD
+    assert suspect["fingerprint"].startswith("SELECT calculations.result FROM calculations WHERE")
+    assert report["fingerprints"][0]["count"] == querylog.N_PLUS_ONE_THRESHOLD
+    events = [json.loads(r.getMessage())["event"] for r in caplog.records]
+    assert "n_plus_one" in events
+
+
+def test_slow_queries_are_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr(querylog, "SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(querylog, "QUERYLOG_DEBUG", True)
+    query_stats.reset()
+    with caplog.at_level(logging.WARNING, logger="app.querylog"):
+        client.get("/calculations")
+
+    records = [json.loads(r.getMessage()) for r in caplog.records]
+    assert records and all(r["event"] == "slow_query" for r in records)
+    data = client.get("/debug/queries").json()
+    assert data["slow_queries"] >= 1
+    assert {"count", "total_ms", "p95_ms"} <= set(data["fingerprints"][0])
+
+
+def test_debug_queries_is_off_by_default(client):
+    assert client.get("/debug/queries").status_code == 404
+    assert "/debug/queries" not in client.get("/openapi.json").json()["paths"]
+
+
+def test_unmatched_paths_share_one_n_plus_one_label():
+    import asyncio
+
+    async def repeat_query(scope, receive, send):
+        querylog._request_queries.get()["SELECT ?"] += querylog.N_PLUS_ONE_THRESHOLD
+
+    middleware = querylog.QueryLogMiddleware(repeat_query)
+    query_stats.reset()
+    for calc_id in (1, 2, 3):
+        scope = {"type": "http", "method": "GET", "path": f"/calculations/{calc_id}"}
+        asyncio.run(middleware(scope, None, None))
+
+    suspects = query_stats.snapshot()["n_plus_one"]
+    assert [(s["route"], s["requests"]) for s in suspects] == [("<unmatched>", 3)]
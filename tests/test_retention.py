@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+
+from app.cache import calculation_cache
+from app.models import Calculation
+from app.retention import RetentionJob, delete_calculations
+
+
+def _create(client, n, op_type="Add"):
+    return [
+        client.post("/calculations", json={"a": i, "b": 1, "op_type": op_type}).json()["id"]
+        for i in range(n)
+    ]
+
+
+def test_bulk_delete_by_filters(client):
+    ids = _create(client, 3, "Sub")
+    client.get(f"/calculations/{ids[0]}")
+    assert calculation_cache.get(ids[0]) is not None
+
+    resp = client.delete("/calculations", params={"ids": ids[:2], "op_type": "Sub"})
+    assert resp.json() == {"deleted": 2}
+    assert calculation_cache.get(ids[0]) is None
+    assert client.get(f"/calculations/{ids[0]}").status_code == 404
+    assert client.get(f"/calculations/{ids[2]}").status_code == 200
+
+    resp = client.delete("/calculations", params={"min_id": ids[2], "max_id": ids[2]})
+    assert resp.json() == {"deleted": 1}
+
+
+def test_bulk_delete_requires_a_filter(client):
+    assert client.delete("/calculations").status_code == 400
+
+
+def test_delete_commits_per_chunk(client, db_session):
+    ids = _create(client, 5, "Divide")
+    chunks = []
+    deleted = delete_calculations(db_session, chunk_size=2, on_chunk=chunks.append, ids=ids)
+    assert deleted == 5
+    assert chunks == [ids[:2], ids[2:4], ids[4:]]
+
+
+def test_retention_job_trims_only_old_rows(client, db_session):
+    old, new = _create(client, 2, "Multiply")
+    db_session.execute(
+        update(Calculation).where(Calculation.id == old).values(created_at=datetime.utcnow() - timedelta(days=40))
+    )
+    db_session.commit()
+
+    job = RetentionJob(lambda: db_session, days=30)
+    assert job.run_once() >= 1
+    remaining = db_session.scalars(select(Calculation.id).where(Calculation.id.in_([old, new]))).all()
+    assert remaining == [new]
@@ -0,0 +1,33 @@
+import json
+
+from app import serialization
+from app.models import Calculation
+from app.schemas import CalculationPage
+
+
+def test_fast_page_matches_response_model():
+    rows = [Calculation(id=i, a=i * 1.5, b=2.0, op_type="Multiply", result=i * 3.0) for i in range(1, 4)]
+    fast = serialization.calculation_page_response(rows, "Mw").body
+    validated = CalculationPage.model_validate({"items": rows, "next_cursor": "Mw"}).model_dump(mode="json")
+    assert json.loads(fast) == validated
+
+
+def test_stdlib_fallback(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps({"op": "Add", "result": 1.5, "name": "é"}) == '{"op":"Add","result":1.5,"name":"é"}'.encode()
+
+
+def test_routes_use_fast_response(client):
+    resp = client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"})
+    assert resp.json()["result"] == 3.0
+    assert resp.headers["content-type"] == "application/json"
+    page = client.get("/calculations", params={"limit": 1}).json()
+    assert set(page["items"][0]) == set(serialization.CALCULATION_FIELDS)
+
+
+def test_whole_number_operands_stay_floats_on_writes(client):
+    created = client.post("/calculations", json={"a": 1, "b": 2, "op_type": "Add"}).json()
+    assert all(isinstance(created[f], float) for f in ("a", "b", "result"))
+    updated = client.put(f"/calculations/{created['id']}", json={"a": 4, "b": 2, "op_type": "Divide"}).json()
+    assert all(isinstance(updated[f], float) for f in ("a", "b", "result"))
+    assert client.get(f"/calculations/{created['id']}").json() == updated
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app import sqlite_tuning
+
+
+def test_profile_overrides_and_unknown_profiles():
+    pragmas = sqlite_tuning.profile_pragmas("fast", "cache_size=-2000, mmap_size=0")
+    assert pragmas["journal_mode"] == "WAL" and pragmas["synchronous"] == "NORMAL"
+    assert pragmas["cache_size"] == "-2000" and pragmas["mmap_size"] == "0"
+    assert sqlite_tuning.profile_pragmas("stock", "") == {}
+    with pytest.raises(ValueError):
+        sqlite_tuning.profile_pragmas("turbo", "")
+
+
+def test_profile_is_applied_on_connect_and_maintenance_checkpoints(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    sqlite_tuning.install(engine, "fast", "")
+    with engine.begin() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -64 * 1024
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    busy, wal_pages, checkpointed = sqlite_tuning.maintain(engine)
+    assert busy == 0 and wal_pages == checkpointed and wal_pages > 0
+    engine.dispose()
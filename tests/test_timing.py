@@ -0,0 +1,63 @@
+import json
+import logging
+
+
+def test_server_timing_header_and_log_line(client, caplog):
+    with caplog.at_level(logging.INFO, logger="app.timing"):
+        resp = client.post("/calculations", json={"a": 7, "b": 5, "op_type": "Sub"})
+    assert resp.status_code == 200
+
+    header = resp.headers["server-timing"]
+    phases = {part.split(";")[0].strip() for part in header.split(",")}
+    assert {"validate", "sql", "commit", "serialize", "total"} <= phases
+
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["route"] == "/calculations" and line["status"] == 200
+    assert line["queries"] >= 1 and line["total_ms"] > 0
+
+
+def test_sessions_are_lazy_and_released_before_serialization():
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from pydantic import BaseModel, field_validator
+    from sqlalchemy import text
+
+    from app import timing
+    from app.database import engine, get_db
+
+    seen = {}
+
+    class Out(BaseModel):
+        value: int
+
+        @field_validator("value")
+        @classmethod
+        def record(cls, value):
+            seen["checked_out_while_serializing"] = engine.pool.checkedout()
+            return value
+
+    app = FastAPI()
+    timing.install(app)
+
+    @app.get("/untouched", response_model=Out)
+    def untouched(db=Depends(get_db)):
+        seen["untouched"] = db
+        return {"value": 1}
+
+    @app.get("/query", response_model=Out)
+    def query(db=Depends(get_db)):
+        seen["checked_out_in_endpoint"] = engine.pool.checkedout()
+        value = db.execute(text("SELECT 1")).scalar()
+        seen["checked_out_after_query"] = engine.pool.checkedout()
+        return {"value": value}
+
+    client = TestClient(app)
+    resp = client.get("/untouched")
+    assert not seen["untouched"].opened
+    assert "conn;" not in resp.headers["server-timing"]
+
+    resp = client.get("/query")
+    assert seen["checked_out_in_endpoint"] == 0
+    assert seen["checked_out_after_query"] == 1
+    assert seen["checked_out_while_serializing"] == 0
+    assert "conn;dur=" in resp.headers["server-timing"]
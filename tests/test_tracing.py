@@ -0,0 +1,97 @@
+import json
+import pytest
+
+from app import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def spans():
+    exporter = tracing.InMemoryExporter()
+    tracing.set_exporter(exporter)
+    yield exporter.spans
+    tracing.set_exporter(None)
+
+
+def test_traceparent_is_continued_and_spans_nest(client, spans):
+    resp = client.post(
+        "/calculations",
+        json={"a": 6, "b": 7, "op_type": "Multiply"},
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+    assert resp.status_code == 200
+
+    root = next(s for s in spans if s.name == "POST /calculations")
+    assert root.parent_id == PARENT_ID
+    assert root.attributes["http.status_code"] == 200
+    assert resp.headers["traceparent"] == f"00-{TRACE_ID}-{root.span_id}-01"
+    assert {s.trace_id for s in spans} == {TRACE_ID}
+
+    by_name = {s.name: s for s in spans}
+    crud_span = by_name["crud.create_calculation"]
+    assert crud_span.parent_id == root.span_id
+    assert by_name["compute"].parent_id == crud_span.span_id
+    queries = [s for s in spans if s.name == "db.query"]
+    assert any(q.attributes["db.statement"].startswith("INSERT") for q in queries)
+    assert all(q.parent_id == crud_span.span_id for q in queries)
+
+
+def test_unsampled_request_records_nothing(client, spans):
+    resp = client.get("/calculations", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert resp.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    assert resp.headers["traceparent"].endswith("-00")
+    assert spans == []
+
+
+def test_invalid_traceparent_starts_new_trace(client, spans):
+    resp = client.get("/calculations", headers={"traceparent": "00-not-a-trace-01"})
+    trace_id = resp.headers["traceparent"].split("-")[1]
+    assert trace_id != TRACE_ID
+    assert {s.trace_id for s in spans} == {trace_id}
+
+
+def test_file_exporter_writes_json_lines(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracing.set_exporter(tracing.FileExporter(str(path)))
+    try:
+        root = tracing.Span("job", "1" * 32)
+        token = tracing._current.set(root)
+        try:
+            with tracing.span("step", n=1):
+                pass
+        finally:
+            tracing._current.reset(token)
+        root.end()
+    finally:
+        tracing.set_exporter(None)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["step", "job"]
+    assert records[0]["parent_id"] == records[1]["span_id"]
+    assert records[0]["attributes"] == {"n": 1}
+
+
+def test_failed_statement_ends_its_span_with_an_error(spans, db_session):
+    from sqlalchemy import text
+    from app import sqlhooks
+
+    seen = []
+    sqlhooks.on_statement(seen.append)
+    token = tracing._current.set(tracing.Span("job", "1" * 32))
+    try:
+        db_session.execute(text("SELECT 1"))
+        with pytest.raises(Exception):
+            db_session.execute(text("SELECT * FROM no_such_table"))
+    finally:
+        tracing._current.reset(token)
+        sqlhooks._listeners.remove(seen.append)
+    db_session.rollback()
+
+    assert [(e.statement, e.error is None) for e in seen] == [
+        ("SELECT 1", True), ("SELECT * FROM no_such_table", False)
+    ]
+    ok, failed = [s for s in spans if s.name == "db.query"]
+    assert ok.status == "ok" and ok.start_ns <= ok.end_ns
+    assert failed.status == "error" and "no_such_table" in failed.attributes["error"]
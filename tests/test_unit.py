@@ -23,4 +23,32 @@ def test_schema_ok_add():
 
 def test_schema_validation_divide_zero():
     with pytest.raises(ValidationError):
-        CalculationCreate(a=1, b=0, op_type=OpType.Divide)
\ No newline at end of file
+        CalculationCreate(a=1, b=0, op_type=OpType.Divide)
+
+
+def test_factory_reuses_operation_instances():
+    assert OperationFactory.get_operation('Sub') is OperationFactory.get_operation('Sub')
+
+
+def test_compute_many_matches_compute():
+    a, b = [1.0, 2.5, -3.0], [4.0, 0.5, 2.0]
+    for op_name in OperationFactory.mapping:
+        op = OperationFactory.get_operation(op_name)
+        result = OperationFactory.compute_many(op_name, a, b)
+        assert result.errors == []
+        assert result.tolist() == [op.compute(x, y) for x, y in zip(a, b)]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_compute_many_masks_divide_by_zero(monkeypatch, use_numpy):
+    from app import factory
+    if not use_numpy:
+        monkeypatch.setattr(factory, "np", None)
+    elif factory.np is None:
+        pytest.skip("NumPy not installed")
+
+    result = OperationFactory.compute_many('Divide', [1, 2, 3], [1, 0, 4])
+    values = result.tolist()
+    assert result.errors == [1]
+    assert values[0] == 1 and values[2] == 0.75
+    assert values[1] != values[1]  # NaN at the masked index
@@ -1,3 +1,6 @@
+import pytest
+
+
 def test_user_register_and_login(client, db_session):
     # register
     resp = client.post("/users/register", json={"username":"testu", "email":"t@example.com", "password":"secret"})
@@ -21,3 +24,165 @@ def test_user_register_and_login(client, db_session):
     resp4 = client.get(f"/calculations/{calc_id}", headers=headers)
     assert resp4.status_code == 200
     assert resp4.json()["result"] == 2.0
+
+
+def test_logout_revokes_only_that_token(client):
+    client.post("/users/register", json={"username": "logoutu", "password": "secret"})
+    first = client.post("/users/login", json={"username": "logoutu", "password": "secret"}).json()["token"]
+    second = client.post("/users/login", json={"username": "logoutu", "password": "secret"}).json()["token"]
+
+    resp = client.post("/users/logout", headers={"Authorization": f"Bearer {first}"})
+    assert resp.status_code == 204
+    resp = client.get("/users/me", headers={"Authorization": f"Bearer {first}"})
+    assert resp.status_code == 401 and resp.json()["detail"] == "Token revoked"
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {second}"}).json()["username"] == "logoutu"
+
+
+def test_revocations_sync_from_the_database(client, db_session):
+    from app.auth import RevocationList, signer
+
+    client.post("/users/register", json={"username": "syncu", "password": "secret"})
+    token = client.post("/users/login", json={"username": "syncu", "password": "secret"}).json()["token"]
+    jti = signer.verify(token)["jti"]
+    client.post("/users/logout", headers={"Authorization": f"Bearer {token}"})
+
+    # What another worker sees after its next sync
+    other_worker = RevocationList()
+    other_worker.sync(db_session)
+    assert jti in other_worker
+
+
+def test_tokens_are_verified_without_queries(client):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    client.post("/users/register", json={"username": "statelessu", "password": "secret"})
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        token = client.post("/users/login", json={"username": "statelessu", "password": "secret"}).json()["token"]
+        client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+    # login: the user lookup only; /users/me: loading the user, not the token
+    assert len(statements) == 2
+    assert not any(s.startswith(("INSERT", "UPDATE")) for s in statements)
+
+
+def test_signed_tokens_reject_tampering_expiry_and_unknown_keys(monkeypatch):
+    from app.auth import TokenError, TokenSigner
+
+    old = TokenSigner("k1:old-secret")
+    rotated = TokenSigner("k2:new-secret,k1:old-secret")
+    token = old.issue(42)
+    assert rotated.verify(token)["sub"] == "42"
+    assert rotated.verify(rotated.issue(7))["sub"] == "7"
+
+    header, payload, signature = token.split(".")
+    for bad in (f"{header}.{payload}x.{signature}", f"{header}.{payload}", "garbage"):
+        with pytest.raises(TokenError):
+            rotated.verify(bad)
+    with pytest.raises(TokenError):
+        TokenSigner("k3:other").verify(token)
+
+    expired = TokenSigner("k1:old-secret", ttl=-1).issue(42)
+    with pytest.raises(TokenError, match="expired"):
+        old.verify(expired)
+
+
+def test_current_user_requires_bearer_token(client):
+    assert client.get("/users/me").status_code == 401
+    assert client.get("/users/me", headers={"Authorization": "Basic abc"}).status_code == 401
+
+
+def test_register_returns_503_when_hash_pool_is_saturated(client, monkeypatch):
+    from app.hashing import hash_pool
+
+    monkeypatch.setattr(hash_pool, "max_pending", 0)
+    resp = client.post("/users/register", json={"username": "busyu", "password": "secret"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    assert client.get("/metrics/hashing").json()["rejected"] >= 1
+
+
+def test_hash_pool_counts_failures_separately():
+    import asyncio
+    from app.hashing import HashingPool
+
+    pool = HashingPool(workers=0, max_pending=2)
+    assert asyncio.run(pool.run(len, "abc")) == 3
+    with pytest.raises(TypeError):
+        asyncio.run(pool.run(len, 42))
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"], stats["in_flight"]) == (1, 1, 0)
+
+
+def test_duplicate_username_and_email_are_400(client):
+    client.post("/users/register", json={"username": "dupu", "email": "dup@example.com", "password": "secret"})
+
+    resp = client.post("/users/register", json={"username": "dupu", "password": "secret"})
+    assert resp.status_code == 400 and resp.json()["detail"] == "Username already exists"
+    resp = client.post("/users/register", json={"username": "dupu2", "email": "dup@example.com", "password": "x"})
+    assert resp.status_code == 400 and resp.json()["detail"] == "Email already exists"
+    # The session is usable again after the rolled-back insert
+    assert client.post("/users/register", json={"username": "dupu3", "password": "secret"}).status_code == 200
+
+
+@pytest.mark.parametrize("message, field", [
+    ("UNIQUE constraint failed: users.username", "username"),
+    ("UNIQUE constraint failed: users.email", "email"),
+    ('duplicate key value violates unique constraint "ix_users_email"\n'
+     "DETAIL:  Key (email)=(myusername@x.com) already exists.", "email"),
+    ('duplicate key value violates unique constraint "ix_users_username"\n'
+     "DETAIL:  Key (username)=(email) already exists.", "username"),
+    ("NOT NULL constraint failed: users.hashed_password", None),
+])
+def test_duplicate_user_field_reads_the_column_not_the_value(message, field):
+    from sqlalchemy.exc import IntegrityError
+    from app.crud import duplicate_user_field
+
+    assert duplicate_user_field(IntegrityError("INSERT ...", {}, Exception(message))) == field
+
+
+def test_concurrent_registration_is_race_free(client, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app.main import app, get_db
+
+    # A real session per request: the shared test session is not thread-safe
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", listener)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            codes = list(pool.map(
+                lambda _: client.post("/users/register", json={"username": "raceu", "password": "secret"}).status_code,
+                range(16),
+            ))
+    finally:
+        event.remove(Engine, "before_cursor_execute", listener)
+
+    assert sorted(codes) == [200] + [400] * 15
+    # One INSERT per attempt and no duplicate-username SELECT
+    assert len(statements) == 16
+    assert all(s.startswith("INSERT INTO users") for s in statements)
+
+
+def test_server_database_needs_signing_keys():
+    import os
+    import subprocess
+    import sys
+
+    def start(**env):
+        env = {k: v for k, v in os.environ.items() if k not in ("AUTH_SIGNING_KEYS", "AUTH_DEV_KEYS")} | env
+        return subprocess.run([sys.executable, "-c", "import app.auth"], env=env, capture_output=True, text=True)
+
+    server = {"DATABASE_URL": "postgresql://app@localhost/app"}
+    refused = start(**server)
+    assert refused.returncode != 0 and "AUTH_SIGNING_KEYS is not set" in refused.stderr
+    assert start(**server, AUTH_DEV_KEYS="true").returncode == 0
+    assert start(**server, AUTH_SIGNING_KEYS="k1:secret").returncode == 0
+    assert start(DATABASE_URL="sqlite:///./test.db").returncode == 0
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud
+from app.crud import DuplicateUser
+from app.models import Calculation
+from app.schemas import CalculationCreate, UserCreate
+from app.writer import WriteQueue
+from tests.conftest import SessionTesting
+
+
+def test_concurrent_writes_are_coalesced_into_shared_transactions(db_session):
+    writer = WriteQueue(SessionTesting)
+    before = db_session.scalar(select(func.count(Calculation.id)))
+    barrier = threading.Barrier(16)
+    rows = []
+
+    def client(i):
+        barrier.wait()
+        for _ in range(10):
+            rows.append(writer.run(crud.create_calculation, CalculationCreate(a=i, b=2, op_type="Add")))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.stop()
+
+    assert len(rows) == 160 and len({row.id for row in rows}) == 160
+    assert db_session.scalar(select(func.count(Calculation.id))) == before + 160
+    assert writer.writes == 160 and writer.batches < 160
+
+
+def test_a_failing_write_only_rolls_back_itself(db_session):
+    writer = WriteQueue(SessionTesting)
+    writer.run(crud.create_user, UserCreate(username="writeru", password="x"), "hash")
+
+    # Keep the writer busy so the next three queue up and share a batch
+    gate = threading.Event()
+    writer.submit(lambda db: gate.wait())
+    first = writer.submit(crud.create_calculation, CalculationCreate(a=1, b=1, op_type="Add"))
+    duplicate = writer.submit(crud.create_user, UserCreate(username="writeru", password="x"), "hash")
+    last = writer.submit(crud.create_calculation, CalculationCreate(a=2, b=2, op_type="Add"))
+    gate.set()
+
+    with pytest.raises(DuplicateUser):
+        duplicate.result()
+    ids = [first.result().id, last.result().id]
+    writer.stop()
+    assert writer.batches <= 3
+    assert db_session.scalars(select(Calculation.id).where(Calculation.id.in_(ids))).all() == ids
+
+
+def test_app_writes_go_through_the_writer(client, monkeypatch):
+    from app import main
+
+    writer = WriteQueue(SessionTesting)
+    monkeypatch.setattr(main, "sqlite_writer", writer)
+    created = client.post("/calculations", json={"a": 3, "b": 4, "op_type": "Multiply"}).json()
+    assert created["result"] == 12
+    assert client.post("/users/register", json={"username": "queuedu", "password": "secret"}).status_code == 200
+    assert client.post("/users/register", json={"username": "queuedu", "password": "secret"}).status_code == 400
+    assert client.delete(f"/calculations/{created['id']}").status_code == 200
+    assert client.get("/metrics/writer").json()["writes"] == 4
+    writer.stop()